@@ -0,0 +1,240 @@
+"""
+Throughput and latency under load, for the request paths that matter most.
+
+Starts benchmarks/server.py in a subprocess, runs every scenario against it
+with the built-in load generator and prints requests per second and
+p50/p95/p99 latency. Results can be written as JSON and compared against a
+stored baseline, and the run fails when a scenario got slower than the
+threshold allows. Run from the repository root:
+
+    python -m benchmarks.bench_load --save-baseline
+    # ...change something...
+    python -m benchmarks.bench_load --compare
+
+To compare the two connection engines, record one as the baseline:
+
+    python -m benchmarks.bench_load --engine streams --save-baseline
+    python -m benchmarks.bench_load --engine protocol --compare
+
+Baselines are only meaningful on the machine they were recorded on.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+
+from benchmarks.loadgen import build_request, run_load_processes
+
+HOST = "127.0.0.1"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "results", "baseline.json")
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    body: bytes = b""
+    keep_alive: bool = True
+
+
+SCENARIOS = [
+    Scenario("plaintext", "GET", "/plaintext"),
+    Scenario("new_connections", "GET", "/plaintext", keep_alive=False),
+    Scenario("path_vars", "GET", "/users/find_one"),
+    Scenario("query_params", "GET", "/search?q=shoes&limit=25&verbose=true&tags=a&tags=b"),
+    Scenario("pyhtml_page", "GET", "/page"),
+    Scenario("static_small", "GET", "/small.css"),
+    Scenario("static_large", "GET", "/large.bin"),
+    Scenario("large_upload", "POST", "/upload", body=b"x" * 1024 * 1024),
+    Scenario("not_found", "GET", "/missing/file.txt"),
+]
+
+
+def _write_static_files(directory: str):
+    with open(os.path.join(directory, "small.css"), "w") as f:
+        f.write("body { margin: 0; }\n" * 100)
+    with open(os.path.join(directory, "large.bin"), "wb") as f:
+        f.write(os.urandom(1024 * 1024))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(port: int, process: subprocess.Popen, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Benchmark server exited with {process.returncode}")
+        try:
+            socket.create_connection((HOST, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Benchmark server didn't start")
+
+
+def run(args) -> dict:
+    selected = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers,
+            "engine": args.engine,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "client_processes": args.client_processes,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory() as static_dir:
+        _write_static_files(static_dir)
+        port = _free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "benchmarks.server",
+                "--port", str(port),
+                "--static-dir", static_dir,
+                "--workers", str(args.workers),
+                "--engine", args.engine,
+            ],
+        )
+        try:
+            _wait_for_server(port, server)
+            for scenario in selected:
+                request = build_request(
+                    scenario.method,
+                    scenario.path,
+                    f"{HOST}:{port}",
+                    scenario.body,
+                    scenario.keep_alive,
+                )
+                # Warm up caches and connections before measuring
+                run_load_processes(
+                    HOST, port, request, args.concurrency, 0.5, scenario.keep_alive
+                )
+                result = run_load_processes(
+                    HOST,
+                    port,
+                    request,
+                    args.concurrency,
+                    args.duration,
+                    scenario.keep_alive,
+                    args.client_processes,
+                )
+                summary = result.summary()
+                results["scenarios"][scenario.name] = summary
+                _print_row(scenario.name, summary)
+        finally:
+            server.terminate()
+            server.wait(timeout=15)
+
+    return results
+
+
+def _print_header():
+    print(f"{'scenario':<18}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+
+def _print_row(name: str, summary: dict):
+    def ms(value):
+        return f"{value:10.2f}" if value is not None else f"{'-':>10}"
+
+    print(
+        f"{name:<18}{summary['rps']:>10.0f}{ms(summary['p50_ms'])}"
+        f"{ms(summary['p95_ms'])}{ms(summary['p99_ms'])}{summary['errors']:>8}"
+    )
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Regressions of `results` against `baseline`: scenarios whose throughput
+    dropped, or whose p99 latency grew, by more than `threshold` (a fraction).
+    """
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        if base["rps"] and current["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: {current['rps']:.0f} rps, baseline {base['rps']:.0f} rps"
+            )
+        if (
+            base["p99_ms"]
+            and current["p99_ms"]
+            and current["p99_ms"] > base["p99_ms"] * (1 + threshold)
+        ):
+            regressions.append(
+                f"{name}: p99 {current['p99_ms']:.2f} ms, baseline {base['p99_ms']:.2f} ms"
+            )
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: {current['errors']} errors, baseline {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run, all by default")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="simultaneous clients")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--engine", choices=["streams", "protocol"], default="streams", help="server connection engine")
+    parser.add_argument("--client-processes", type=int, default=1, help="load generator processes")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="fail if the results regressed from the baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed regression, 0.15 = 15%%")
+    parser.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print(f"{scenario.name:<18}{scenario.method} {scenario.path}")
+        return
+
+    unknown = set(args.scenarios) - {s.name for s in SCENARIOS}
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    _print_header()
+    results = run(args)
+
+    outputs = [args.output] if args.output else []
+    if args.save_baseline:
+        outputs.append(args.baseline)
+    for path in outputs:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {path}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressed by more than {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
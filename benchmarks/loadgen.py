@@ -0,0 +1,184 @@
+"""
+A small asyncio HTTP/1.1 load generator, so the benchmarks don't need wrk,
+ab or anything else installed.
+
+Each simulated client sends a request, reads the whole response and records
+how long that took, then sends the next one until the duration is up. With
+`keep_alive` the clients reuse their connection, otherwise every request
+opens a new one.
+"""
+
+import asyncio
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+
+@dataclass
+class LoadResult:
+    latencies: list[float] = field(default_factory=list)  # seconds
+    errors: int = 0
+    bytes_received: int = 0
+    elapsed: float = 0.0
+
+    def merge(self, other: "LoadResult"):
+        self.latencies += other.latencies
+        self.errors += other.errors
+        self.bytes_received += other.bytes_received
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "rps": round(count / self.elapsed, 1) if self.elapsed else 0.0,
+            "mean_ms": round(sum(latencies) / count * 1000, 3) if count else None,
+            "p50_ms": _percentile_ms(latencies, 50),
+            "p95_ms": _percentile_ms(latencies, 95),
+            "p99_ms": _percentile_ms(latencies, 99),
+            "max_ms": round(latencies[-1] * 1000, 3) if count else None,
+            "mb_received": round(self.bytes_received / 1024 / 1024, 2),
+        }
+
+
+def _percentile_ms(latencies: list[float], percentile: float) -> float | None:
+    """Nearest-rank percentile of already sorted latencies, in milliseconds."""
+    if not latencies:
+        return None
+    rank = max(math.ceil(percentile / 100 * len(latencies)), 1)
+    return round(latencies[rank - 1] * 1000, 3)
+
+
+def build_request(
+    method: str, path: str, host: str, body: bytes = b"", keep_alive: bool = True
+) -> bytes:
+    lines = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {host}",
+        "Connection: keep-alive" if keep_alive else "Connection: close",
+    ]
+    if body or method in ("POST", "PUT", "PATCH"):
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, int, bool]:
+    """Read one response, returns (status, body size, whether the server keeps the connection)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        key, sep, value = line.partition(":")
+        if sep:
+            headers[key.strip().lower()] = value.strip().lower()
+
+    keep_alive = headers.get("connection") != "close"
+    if headers.get("transfer-encoding") == "chunked":
+        size = 0
+        while True:
+            chunk_size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(chunk_size + 2)
+            size += chunk_size
+            if chunk_size == 0:
+                break
+    elif "content-length" in headers:
+        size = int(headers["content-length"])
+        await reader.readexactly(size)
+    else:
+        size = len(await reader.read())
+        keep_alive = False
+    return status, size, keep_alive
+
+
+async def _client(
+    host: str, port: int, request: bytes, keep_alive: bool, deadline: float, result: LoadResult
+):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status, size, server_keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+
+        if status >= 500:
+            result.errors += 1
+        else:
+            result.latencies.append(time.perf_counter() - started)
+            result.bytes_received += size
+
+        if not (keep_alive and server_keep_alive):
+            writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(
+    host: str,
+    port: int,
+    request: bytes,
+    concurrency: int = 32,
+    duration: float = 5.0,
+    keep_alive: bool = True,
+) -> LoadResult:
+    result = LoadResult()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(
+        *(
+            _client(host, port, request, keep_alive, deadline, result)
+            for _ in range(concurrency)
+        )
+    )
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _run_load_sync(*args) -> LoadResult:
+    return asyncio.run(run_load(*args))
+
+
+def run_load_processes(
+    host: str,
+    port: int,
+    request: bytes,
+    concurrency: int = 32,
+    duration: float = 5.0,
+    keep_alive: bool = True,
+    processes: int = 1,
+) -> LoadResult:
+    """
+    Run the load from `processes` client processes, splitting `concurrency`
+    between them. A single Python client tops out well before a multi-worker
+    server does.
+    """
+    if processes <= 1:
+        return _run_load_sync(host, port, request, concurrency, duration, keep_alive)
+
+    per_process = [concurrency // processes] * processes
+    for i in range(concurrency % processes):
+        per_process[i] += 1
+
+    result = LoadResult()
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [
+            pool.submit(_run_load_sync, host, port, request, n, duration, keep_alive)
+            for n in per_process
+            if n > 0
+        ]
+        for future in futures:
+            result.merge(future.result())
+    return result
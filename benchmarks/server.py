@@ -0,0 +1,79 @@
+"""
+The application the load benchmarks run against. bench_load starts it in a
+separate process so the server and the load generator don't share a CPU.
+
+    python -m benchmarks.server --port 8099 --static-dir DIR [--workers N] [--engine E]
+"""
+
+import argparse
+import logging
+from typing import Optional
+
+from webserver import Webserver, pyhtml
+from webserver.enums import HTTPRequest, HTMLResponse
+
+
+def make_server(
+    port: int, static_dir: str, workers: int = 1, engine: str = "streams"
+) -> Webserver:
+    server = Webserver(
+        "127.0.0.1",
+        port,
+        static_files_dir=static_dir,
+        workers=workers,
+        engine=engine,
+        log_level=logging.WARNING,
+        access_log=False,
+        log_file=None,
+    )
+
+    @server.get("/plaintext")
+    async def plaintext():
+        return "Hello, World!"
+
+    @server.get("/{collection}/find_one")
+    async def find_one(request: HTTPRequest, collection: str):
+        return collection
+
+    @server.get("/search")
+    async def search(
+        q: str, limit: int = 10, verbose: bool = False, tags: Optional[list[str]] = None
+    ):
+        return f"{q} {limit} {verbose} {','.join(tags or [])}"
+
+    @server.get("/page")
+    async def page():
+        return HTMLResponse(
+            pyhtml.html(
+                pyhtml.head(pyhtml.title("Benchmark")),
+                pyhtml.body(
+                    pyhtml.h1("Items"),
+                    pyhtml.ul(
+                        *(
+                            pyhtml.li(pyhtml.a(f"Item {i}", attr={"href": f"/items/{i}"}))
+                            for i in range(100)
+                        )
+                    ),
+                ),
+            )
+        )
+
+    @server.post("/upload")
+    async def upload(request: HTTPRequest):
+        return str(len(request.raw_body))
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--static-dir", required=True)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--engine", choices=["streams", "protocol"], default="streams")
+    args = parser.parse_args()
+    make_server(args.port, args.static_dir, args.workers, args.engine).start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import asyncio
+from collections.abc import Iterable
+
+from webserver.enums import HTTPResponse, HTTPResponseCode, PreEncodedResponse
+
+
+class AdmissionController:
+    """
+    Decides when the server is too busy to take on more work.
+
+    New connections are turned away once `max_connections` are open, and
+    requests once `max_in_flight` are being handled or the event loop is
+    running more than `max_loop_lag` seconds behind. Rejected clients get a
+    503 with Retry-After straight away, before the request is parsed, so an
+    overloaded server keeps its latency bounded for the requests it accepts.
+    Requests whose path starts with one of `priority_paths` are only refused
+    when the connection limit is hit. Limits left as None are not enforced.
+    """
+
+    def __init__(
+        self,
+        max_connections: int | None = None,
+        max_in_flight: int | None = None,
+        max_loop_lag: float | None = None,  # seconds
+        priority_paths: Iterable[str] = (),
+        retry_after: int = 1,  # seconds
+        probe_interval: float = 0.1,  # seconds
+    ):
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.priority_paths = tuple(path.encode("latin-1") for path in priority_paths)
+        self.probe_interval = probe_interval
+        self.response = PreEncodedResponse(
+            HTTPResponse(
+                "Service Unavailable",
+                {"Retry-After": str(retry_after)},
+                HTTPResponseCode.SERVICE_UNAVAILABLE,
+            )
+        )
+
+        self.loop_lag = 0.0  # seconds, from the last probe
+        self.shed = {"connections": 0, "in_flight": 0, "loop_lag": 0}
+
+    def accept_connection(self, open_connections: int) -> bool:
+        if self.max_connections is not None and open_connections >= self.max_connections:
+            self.shed["connections"] += 1
+            return False
+        return True
+
+    def accept_request(self, head: bytes, in_flight: int) -> bool:
+        """Whether to handle the request with the raw `head`, given `in_flight` requests."""
+        if self.max_in_flight is not None and in_flight >= self.max_in_flight:
+            reason = "in_flight"
+        elif self.max_loop_lag is not None and self.loop_lag > self.max_loop_lag:
+            reason = "loop_lag"
+        else:
+            return True
+
+        if self.priority_paths:
+            # Only the request target is needed, skip parsing the headers
+            target = head.split(b"\r\n", 1)[0].split(b" ")
+            if len(target) == 3 and target[1].startswith(self.priority_paths):
+                return True
+
+        self.shed[reason] += 1
+        return False
+
+    async def probe_loop_lag(self):
+        """Measure how late the event loop wakes up from a sleep, until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.probe_interval)
+            self.loop_lag = max(loop.time() - started - self.probe_interval, 0.0)
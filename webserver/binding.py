@@ -0,0 +1,130 @@
+import inspect
+import types
+import typing
+from typing import Any, Callable
+
+from webserver.enums import HTTPRequest
+
+_MISSING = object()
+
+
+def _to_bool(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in ("true", "1", "yes", "on"):
+        return True
+    if lowered in ("false", "0", "no", "off", ""):
+        return False
+    raise ValueError(f"Invalid boolean value {value!r}")
+
+
+def _converter(name: str, annotation) -> Callable[[str], Any] | None:
+    """Return the callable converting a raw string to `annotation`, None for no conversion."""
+    if annotation in (inspect.Parameter.empty, str, Any):
+        return None
+    if annotation is bool:
+        return _to_bool
+    if annotation in (int, float):
+        return annotation
+    if typing.get_origin(annotation) is not None or not callable(annotation):
+        # Literal[...], dict[...] and the like can't be called with a string
+        raise TypeError(f"Unsupported annotation {annotation!r} for parameter {name}")
+
+    def convert(value: str):
+        # Other types may raise anything for a bad value, e.g. TypeError from
+        # datetime.date("2024-01-01"), but a bad value is a 400 like for int
+        try:
+            return annotation(value)
+        except Exception as e:
+            raise ValueError(f"Invalid value {value!r} for parameter {name}") from e
+
+    return convert
+
+
+def _unwrap(annotation) -> tuple[Any, bool, bool]:
+    """Split an annotation into (inner type, is Optional, is list)."""
+    optional = False
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        optional = len(args) < len(typing.get_args(annotation))
+        annotation = args[0] if len(args) == 1 else inspect.Parameter.empty
+        origin = typing.get_origin(annotation)
+
+    if annotation is list or origin is list:
+        args = typing.get_args(annotation)
+        return (args[0] if args else inspect.Parameter.empty), optional, True
+
+    return annotation, optional, False
+
+
+class Binder:
+    """
+    Builds the positional arguments for a route handler.
+
+    Everything that depends only on the handler signature (which argument comes
+    from where, how it is converted, defaults) is worked out once when the route
+    is registered. Binding a request is then a single pass over a list of
+    extractor callables. Extractors raise ValueError for missing or invalid
+    values, which the server answers with 400 Bad Request. Annotations that
+    can't convert a string raise TypeError when the route is registered.
+    """
+
+    __slots__ = ("extractors",)
+
+    def __init__(self, handler: Callable, path_vars: list[str]):
+        self.extractors: list[Callable[[HTTPRequest, dict], Any]] = []
+
+        signature = inspect.signature(handler)
+        for name, param in signature.parameters.items():
+            if param.kind not in (
+                inspect.Parameter.POSITIONAL_ONLY,
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            ):
+                continue
+
+            annotation, optional, multi = _unwrap(param.annotation)
+            default = param.default
+            if default is inspect.Parameter.empty:
+                default = None if optional else _MISSING
+
+            if name == "request" or annotation is HTTPRequest:
+                self.extractors.append(self._request)
+            elif name in path_vars:
+                self.extractors.append(self._path_var(name, _converter(name, annotation)))
+            else:
+                self.extractors.append(
+                    self._query_param(name, _converter(name, annotation), default, multi)
+                )
+
+    def __call__(self, request: HTTPRequest, path_vars: dict[str, str]) -> list:
+        return [extract(request, path_vars) for extract in self.extractors]
+
+    @staticmethod
+    def _request(request, path_vars):
+        return request
+
+    @staticmethod
+    def _path_var(name, convert):
+        if convert is None:
+            return lambda request, path_vars: path_vars[name]
+        return lambda request, path_vars: convert(path_vars[name])
+
+    @staticmethod
+    def _query_param(name, convert, default, multi):
+        def extract(request, path_vars):
+            if multi:
+                values = request.query_params_all.get(name)
+                if values is None:
+                    if default is _MISSING:
+                        raise ValueError(f"Missing query parameter {name}")
+                    return default
+                return values if convert is None else [convert(v) for v in values]
+
+            value = request.query_params.get(name, _MISSING)
+            if value is _MISSING:
+                if default is _MISSING:
+                    raise ValueError(f"Missing query parameter {name}")
+                return default
+            return value if convert is None else convert(value)
+
+        return extract
@@ -0,0 +1,239 @@
+import os
+import asyncio
+import zlib
+from collections import OrderedDict
+
+from webserver.enums import (
+    HTTPRequest,
+    HTTPResponse,
+    FileResponse,
+    PreEncodedResponse,
+    StreamingResponse,
+)
+
+# Content types worth compressing. Anything under text/ is also compressed.
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/javascript",
+        "application/json",
+        "application/manifest+json",
+        "application/xml",
+        "application/xhtml+xml",
+        "application/rss+xml",
+        "application/atom+xml",
+        "application/wasm",
+        "image/svg+xml",
+        "font/ttf",
+        "font/otf",
+    }
+)
+
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+
+
+def is_compressible_type(content_type: str | None) -> bool:
+    if content_type is None:
+        return False
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """Pick the preferred supported encoding from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = qualities.get(encoding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressobj(encoding: str, level: int):
+    # wbits 16 + MAX_WBITS writes a gzip header, MAX_WBITS a zlib one
+    wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+    return zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    compressor = _compressobj(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _add_vary(headers: dict) -> dict:
+    vary = headers.get("Vary")
+    if vary is None:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+    return headers
+
+
+class Compressor:
+    """
+    Compresses responses with gzip or deflate, as negotiated from the
+    request's Accept-Encoding header.
+
+    Only bodies of at least `min_size` bytes with a text-like content type are
+    compressed (plain `str` bodies without a Content-Type count as text).
+    Bodies over `executor_threshold` bytes are compressed in the default
+    executor so the event loop keeps serving other connections.
+
+    Static files use a precompressed `.gz` sibling when one exists. Otherwise,
+    static files of up to `max_cached_file_size` bytes are compressed once and
+    kept in an LRU cache of at most `cache_size` bytes.
+    """
+
+    def __init__(
+        self,
+        min_size: int = 1024,  # 1 KB
+        level: int = 6,
+        content_types: frozenset[str] = COMPRESSIBLE_TYPES,
+        executor_threshold: int = 1024 * 64,  # 64 KB
+        cache_size: int = 1024 * 1024 * 8,  # 8 MB
+        max_cached_file_size: int = 1024 * 1024,  # 1 MB
+    ):
+        self.min_size = min_size
+        self.level = level
+        self.content_types = content_types
+        self.executor_threshold = executor_threshold
+        self.cache_size = cache_size
+        self.max_cached_file_size = max_cached_file_size
+        self.cache: OrderedDict[tuple, HTTPResponse] = OrderedDict()
+        self.cached_bytes = 0
+
+    def _compressible(self, response: HTTPResponse) -> bool:
+        content_type = response.headers.get("Content-Type")
+        if content_type is None:
+            return isinstance(response.body, str)
+        media_type = content_type.split(";")[0].strip().lower()
+        return media_type.startswith("text/") or media_type in self.content_types
+
+    async def _compress(self, data: bytes, encoding: str) -> bytes:
+        if len(data) > self.executor_threshold:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, compress, data, encoding, self.level)
+        return compress(data, encoding, self.level)
+
+    async def apply(self, request: HTTPRequest, response: HTTPResponse) -> HTTPResponse:
+        """Return `response` compressed for `request`, or unchanged if it shouldn't be."""
+        code = response.status.value.code
+        if (
+            code < 200
+            or code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or not self._compressible(response)
+        ):
+            return response
+
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+
+        if isinstance(response, StreamingResponse):
+            headers = _add_vary(dict(response.headers))
+            if encoding is None:
+                return StreamingResponse(
+                    response.body, headers, response.status, response.executor
+                )
+            headers["Content-Encoding"] = encoding
+            return StreamingResponse(
+                self._compress_stream(response, encoding), headers, response.status
+            )
+
+        if isinstance(response, FileResponse) or (
+            isinstance(response, PreEncodedResponse) and response.path is not None
+        ):
+            return await self._apply_static(response, encoding)
+        if isinstance(response, PreEncodedResponse):
+            # Already serialized, the route cache stores responses compressed
+            return response
+
+        body = response.body
+        if not isinstance(body, (bytes, bytearray, memoryview)):
+            body = str(body).encode()
+        if len(body) < self.min_size:
+            return response
+
+        headers = _add_vary(dict(response.headers))
+        if encoding is None:
+            return HTTPResponse(body, headers, response.status)
+
+        headers["Content-Encoding"] = encoding
+        return HTTPResponse(await self._compress(body, encoding), headers, response.status)
+
+    async def _compress_stream(self, response: StreamingResponse, encoding: str):
+        compressor = _compressobj(encoding, self.level)
+        async for chunk in response.chunks():
+            # Sync flush so every chunk reaches the client as soon as it's ready
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    async def _apply_static(self, response: HTTPResponse, encoding: str | None):
+        size = response.count if isinstance(response, FileResponse) else len(response.body)
+        if encoding is None or size < self.min_size:
+            return response
+
+        etag = response.headers.get("ETag")
+        key = (response.path, etag, encoding)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            return cached
+
+        headers = {**response.headers, "Content-Encoding": encoding}
+        if etag is not None:
+            # The compressed representation differs byte-wise, so its validator
+            # is weak (the same thing nginx does)
+            headers["ETag"] = f"W/{etag.removeprefix('W/')}"
+        headers.pop("Accept-Ranges", None)
+        headers.pop("Content-Length", None)
+
+        sibling = f"{response.path}.gz"
+        if encoding == "gzip" and os.path.isfile(sibling):
+            sibling_size = os.path.getsize(sibling)
+            if sibling_size > self.max_cached_file_size:
+                return FileResponse(sibling, 0, sibling_size, headers, response.status)
+            with open(sibling, "rb") as file:
+                data = file.read()
+        else:
+            if size > self.max_cached_file_size:
+                return response
+            if isinstance(response, FileResponse):
+                with open(response.path, "rb") as file:
+                    file.seek(response.offset)
+                    body = file.read(response.count)
+            else:
+                body = response.body
+            data = await self._compress(body, encoding)
+
+        compressed = PreEncodedResponse(
+            HTTPResponse(data, headers, response.status), response.path
+        )
+        self._store(key, compressed)
+        return compressed
+
+    def _store(self, key: tuple, response: PreEncodedResponse):
+        size = len(response.head) + len(response.body)
+        if size > self.cache_size:
+            return
+        self.cache[key] = response
+        self.cached_bytes += size
+        while self.cached_bytes > self.cache_size:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= len(evicted.head) + len(evicted.body)
@@ -0,0 +1,60 @@
+import time
+import asyncio
+from collections.abc import Callable
+from typing import Optional
+
+from webserver.timers import Timer
+
+
+class Connection:
+    """State of one open client connection."""
+
+    __slots__ = (
+        "reader",
+        "writer",
+        "transport",
+        "client_address",
+        "connected_at",
+        "requests_served",
+        "task",
+        "request",
+        "timer",
+        "phase",
+        "timed_out",
+    )
+
+    def __init__(
+        self,
+        reader: Optional[asyncio.StreamReader],
+        writer: asyncio.StreamWriter,
+        on_timeout: Optional[Callable[[], None]] = None,
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.transport = writer.transport
+        self.client_address = writer.get_extra_info("peername")
+        self.connected_at = time.monotonic()
+        self.requests_served = 0
+        # The task serving the connection and the request it is handling
+        self.task = asyncio.current_task()
+        self.request = None
+        # Deadline of the current phase: "idle", "header", "body" or "handler".
+        # Expiring cancels the task unless `on_timeout` is given.
+        self.timer = Timer(on_timeout or self._expire)
+        self.phase = "idle"
+        self.timed_out = False
+
+    def _expire(self):
+        self.timed_out = True
+        self.task.cancel()
+
+    @property
+    def write_buffer_size(self) -> int:
+        """Bytes written to the connection that the client hasn't read yet."""
+        return self.transport.get_write_buffer_size()
+
+    def __str__(self):
+        return f"Connection({self.client_address}, buffered={self.write_buffer_size})"
+
+    def __repr__(self):
+        return self.__str__()
@@ -1,5 +1,12 @@
+import asyncio
 from enum import Enum
+from concurrent.futures import Executor
 from dataclasses import dataclass, field
+from types import MappingProxyType
+from collections.abc import AsyncIterable, AsyncIterator, Iterator
+from urllib.parse import parse_qsl
+
+from webserver.headers import Headers
 
 
 class HTTPMethod(Enum):
@@ -100,60 +107,174 @@ class HTTPResponseCode(Enum):
         511, "Network Authentication Required")
 
 
-@dataclass
 class HTTPRequest:
-    http_version: HTTPVersion
-    method: HTTPMethod
-    path: str
-    headers: dict
-    cookies: dict
-    body: str
-    client_address: tuple
-    query_params: dict | None = None
+    """
+    A parsed HTTP request.
+
+    The request line and headers are parsed up front, everything else is
+    parsed from the raw bytes the first time it is accessed: `body` (text),
+    `cookies`, `query_params` and `query_params_all`. `route` is the template
+    of the route the request matched, or None.
+
+    `client_address` honours X-Forwarded-For and X-Real-IP, which any client
+    can send. `peer_address` is the address of the socket peer, use it for
+    access checks.
+    """
+
+    __slots__ = (
+        "http_version",
+        "method",
+        "path",
+        "headers",
+        "client_address",
+        "peer_address",
+        "scheme",
+        "raw_head",
+        "raw_body",
+        "query_string",
+        "route",
+        "_body",
+        "_cookies",
+        "_query_params",
+        "_query_params_all",
+    )
+
+    def __init__(
+        self,
+        http_version: HTTPVersion,
+        method: HTTPMethod,
+        path: str,
+        headers: Headers,
+        client_address: tuple,
+        body: bytes = b"",
+        query_string: str = "",
+        scheme: str = "http",
+        raw_head: bytes = b"",
+        peer_address: tuple | None = None,
+    ):
+        self.http_version = http_version
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.client_address = client_address
+        self.peer_address = peer_address if peer_address is not None else client_address
+        self.scheme = scheme
+        self.raw_head = raw_head
+        self.raw_body = memoryview(body)
+        self.query_string = query_string
+        self.route: str | None = None
+        self._body: str | None = None
+        self._cookies: dict | None = None
+        self._query_params: dict[str, str] | None = None
+        self._query_params_all: dict[str, list[str]] | None = None
 
     @classmethod
     def from_string(cls, request: str, client_address: tuple):
-        lines = request.split("\r\n")
-        method, path, http_version = lines[0].split(" ")
-        query_params = None
-        if "?" in path:
-            path, query_string = path.split("?")
-            query_params = {}
-            for param in query_string.split("&"):
-                key, value = param.split("=")
-                query_params[key] = value
-        headers = {}
-        cookies = {}
-        for line in lines[1:]:
-            if not line:
-                break
-            key, value = line.split(": ")
-            headers[key] = value
-            if key == "Cookie":
-                for cookie in value.split("; "):
-                    key, value = cookie.split("=")
-                    cookies[key] = value
-        
-        body = lines[-1]
+        head, _, body = request.encode().partition(b"\r\n\r\n")
+        request = cls.from_bytes(head, body, client_address)
 
         # Content-Length should match body length
-        if headers.get("Content-Length") is not None:
-            content_length = int(headers["Content-Length"])
+        if request.headers.get("Content-Length") is not None:
+            content_length = int(request.headers["Content-Length"])
             if len(body) != content_length:
                 raise ValueError("Content-Length does not match body length")
-        
+
+        return request
+
+    @classmethod
+    def from_bytes(cls, head: bytes, body: bytes, client_address: tuple):
+        # Header fields are ISO-8859-1 per RFC 9110, so decoding never fails
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, http_version = lines[0].split(" ")
+        path, _, query_string = target.partition("?")
+
+        items = []
+        for line in lines[1:]:
+            key, sep, value = line.partition(":")
+            if not sep:
+                raise ValueError(f"Invalid header line {line!r}")
+            items.append((key.strip(), value.strip()))
+        headers = Headers(items)
+
         # Check for forwarded headers
+        peer_address = client_address
+        scheme = "http"
         if headers.get("X-Forwarded-For") is not None:
             client_address = (headers["X-Forwarded-For"], client_address[1])
         if headers.get("X-Forwarded-Port") is not None:
             client_address = (client_address[0], int(headers["X-Forwarded-Port"]))
         if headers.get("X-Forwarded-Proto") is not None:
-            http_version = headers["X-Forwarded-Proto"]
+            scheme = headers["X-Forwarded-Proto"]
         if headers.get("X-Real-IP") is not None:
             client_address = (headers["X-Real-IP"], client_address[1])
-        
-        return cls(HTTPVersion(http_version), HTTPMethod(method), path, headers, cookies, body, client_address, query_params)
-    
+
+        return cls(
+            HTTPVersion(http_version),
+            HTTPMethod(method),
+            path,
+            headers,
+            client_address,
+            body,
+            query_string,
+            scheme,
+            head,
+            peer_address,
+        )
+
+    def __reduce__(self):
+        # memoryview can't be pickled, which handlers run in a process pool need
+        return (
+            self.__class__,
+            (
+                self.http_version,
+                self.method,
+                self.path,
+                self.headers,
+                self.client_address,
+                bytes(self.raw_body),
+                self.query_string,
+                self.scheme,
+                self.raw_head,
+                self.peer_address,
+            ),
+        )
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._body = str(self.raw_body, "utf-8", "replace")
+        return self._body
+
+    @property
+    def cookies(self) -> dict:
+        if self._cookies is None:
+            cookies = {}
+            for cookie in self.headers.get("Cookie", "").split(";"):
+                key, sep, value = cookie.partition("=")
+                if sep:
+                    cookies[key.strip()] = value.strip()
+            self._cookies = cookies
+        return self._cookies
+
+    @property
+    def query_params_all(self) -> dict[str, list[str]]:
+        """URL-decoded query parameters, with every value of repeated keys."""
+        if self._query_params_all is None:
+            params: dict[str, list[str]] = {}
+            for key, value in parse_qsl(self.query_string, keep_blank_values=True):
+                params.setdefault(key, []).append(value)
+            self._query_params_all = params
+        return self._query_params_all
+
+    @property
+    def query_params(self) -> dict[str, str]:
+        """URL-decoded query parameters, using the last value of repeated keys."""
+        if self._query_params is None:
+            self._query_params = {
+                key: values[-1] for key, values in self.query_params_all.items()
+            }
+        return self._query_params
+
     def __str__(self):
         return f"""HTTPRequest(
     http_version={self.http_version},
@@ -166,6 +287,9 @@ class HTTPRequest:
     query_params={self.query_params}
 )"""
 
+    def __repr__(self):
+        return self.__str__()
+
 
 @dataclass
 class HTTPResponse:
@@ -175,57 +299,224 @@ class HTTPResponse:
 
     # TODO: Add support for Set-Cookie header
 
-    def to_string(self):
-        if self.headers.get("Server") is None:
-            self.headers["Server"] = "alec-jensen/webserver"
+    def encode(self, keep_alive: bool = False) -> list[bytes]:
+        """
+        Serialize the response as a list of byte strings for writer.writelines:
+        the status line and headers, the Connection header, and the body.
+        """
+        body = self.body
+        if self.status in BODYLESS_STATUSES:
+            # Anything sent here would be read as the start of the next response
+            body = b""
+        elif not isinstance(body, (bytes, bytearray, memoryview)):
+            body = str(body).encode()
+        return [self._encode_head(len(body)), CONNECTION_HEADERS[keep_alive], body]
+
+    def to_bytes(self, keep_alive: bool = False) -> bytes:
+        return b"".join(self.encode(keep_alive))
+
+    def to_string(self, keep_alive: bool = False):
+        return self.to_bytes(keep_alive).decode()
 
-        headers = "\r\n".join([f"{key}: {value}" for key, value in self.headers.items()])
-        return f"HTTP/1.1 {self.status.value}\r\n{headers}\r\n\r\n{self.body}"
+    def _encode_head(self, content_length: int | None) -> bytes:
+        """
+        Status line and headers, without the Connection header and the blank
+        line. Content-Length is left out if `content_length` is None.
+        """
+        headers = "".join(
+            [
+                f"{key}: {value}\r\n"
+                for key, value in self.headers.items()
+                if key.lower() not in GENERATED_HEADERS
+            ]
+        )
+        if "Server" not in self.headers:
+            headers += SERVER_HEADER
+        if content_length is not None and self.status not in BODYLESS_STATUSES:
+            headers += f"Content-Length: {content_length}\r\n"
+        return STATUS_LINES[self.status] + headers.encode()
+
+
+STATUS_LINES = {
+    status: f"HTTP/1.1 {status.value}\r\n".encode() for status in HTTPResponseCode
+}
+
+# 1xx, 204 and 304 responses never have a body (RFC 9110 8.6)
+BODYLESS_STATUSES = frozenset(
+    status
+    for status in HTTPResponseCode
+    if status.value.code < 200 or status.value.code in (204, 304)
+)
+
+# Set by the serializer, values from the headers dict are ignored
+GENERATED_HEADERS = frozenset({"content-length", "connection", "transfer-encoding"})
+
+SERVER_HEADER = "Server: alec-jensen/webserver\r\n"
+
+CONNECTION_HEADERS = {
+    True: b"Connection: keep-alive\r\n\r\n",
+    False: b"Connection: close\r\n\r\n",
+}
+
+
+class PreEncodedResponse(HTTPResponse):
+    """
+    Immutable response serialized to bytes ahead of time, for responses that
+    are sent many times. Only the Connection header is added per request.
+    """
+
+    def __init__(self, response: HTTPResponse, path: str | None = None):
+        body = response.body
+        if response.status in BODYLESS_STATUSES:
+            body = b""
+        elif not isinstance(body, bytes):
+            body = str(body).encode()
+        super().__init__(body, MappingProxyType(dict(response.headers)), response.status)
+        self.head = response._encode_head(len(body))
+        # The file the body was read from, for static files
+        self.path = path
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"{self.__class__.__name__} is immutable")
+        super().__setattr__(name, value)
+
+    def encode(self, keep_alive: bool = False) -> list[bytes]:
+        return [self.head, CONNECTION_HEADERS[keep_alive], self.body]
+
+
+class FileResponse(HTTPResponse):
+    """
+    Response whose body is `count` bytes of the file at `path`, starting at
+    `offset`. The file is not read into memory, the server streams it to the
+    socket when sending the response.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        offset: int,
+        count: int,
+        headers: dict | None = None,
+        status: HTTPResponseCode = HTTPResponseCode.OK,
+    ):
+        super().__init__("", headers if headers is not None else {}, status)
+        self.path = path
+        self.offset = offset
+        self.count = count
+
+    def encode(self, keep_alive: bool = False) -> list[bytes]:
+        return [self._encode_head(self.count), CONNECTION_HEADERS[keep_alive]]
+
+
+# Returned by next() once an iterator is exhausted
+_END = object()
+
+
+class StreamingResponse(HTTPResponse):
+    """
+    Response whose body is an iterator or async iterator of str or bytes
+    chunks, sent to the client as the chunks are produced. The body is sent
+    with chunked transfer encoding, or for HTTP/1.0 clients (`chunked` False)
+    ended by closing the connection. With an `executor`, a regular iterator
+    is advanced in the executor so producing a chunk doesn't block the event
+    loop.
+    """
+
+    def __init__(
+        self,
+        body: Iterator | AsyncIterable,
+        headers: dict | None = None,
+        status: HTTPResponseCode = HTTPResponseCode.OK,
+        executor: Executor | None = None,
+    ):
+        super().__init__(body, dict(headers or {}), status)
+        self.chunked = True
+        self.executor = executor
+
+    def encode(self, keep_alive: bool = False) -> list[bytes]:
+        head = self._encode_head(None)
+        if self.chunked and self.status not in BODYLESS_STATUSES:
+            head += b"Transfer-Encoding: chunked\r\n"
+        return [head, CONNECTION_HEADERS[keep_alive]]
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The body as bytes, whichever kind of iterator it is."""
+        body = self.body
+        try:
+            if isinstance(body, AsyncIterable):
+                async for chunk in body:
+                    yield chunk if isinstance(chunk, bytes) else str(chunk).encode()
+            elif self.executor is not None:
+                loop = asyncio.get_running_loop()
+                iterator = iter(body)
+                while True:
+                    chunk = await loop.run_in_executor(self.executor, next, iterator, _END)
+                    if chunk is _END:
+                        break
+                    yield chunk if isinstance(chunk, bytes) else str(chunk).encode()
+            else:
+                for chunk in body:
+                    yield chunk if isinstance(chunk, bytes) else str(chunk).encode()
+        finally:
+            # Run the handler's cleanup even if the client went away mid-stream
+            if hasattr(body, "aclose"):
+                await body.aclose()
+            elif hasattr(body, "close"):
+                try:
+                    body.close()
+                except ValueError:
+                    # Still producing a chunk in the executor, it's closed
+                    # when garbage collected instead
+                    pass
 
 
 class HTMLResponse(HTTPResponse):
-    def __init__(self, body: str, headers: dict = {}, status: HTTPResponseCode = HTTPResponseCode.OK):
-        super().__init__(body, headers, status)
+    def __init__(self, body: str, headers: dict | None = None, status: HTTPResponseCode = HTTPResponseCode.OK):
+        super().__init__(body, dict(headers or {}), status)
         self.headers["Content-Type"] = "text/html"
 
 class HTTPError:
-    BAD_REQUEST = HTTPResponse("Bad Request", {}, HTTPResponseCode.BAD_REQUEST)
-    UNAUTHORIZED = HTTPResponse("Unauthorized", {}, HTTPResponseCode.UNAUTHORIZED)
-    PAYMENT_REQUIRED = HTTPResponse("Payment Required", {}, HTTPResponseCode.PAYMENT_REQUIRED)
-    FORBIDDEN = HTTPResponse("Forbidden", {}, HTTPResponseCode.FORBIDDEN)
-    NOT_FOUND = HTTPResponse("Not Found", {}, HTTPResponseCode.NOT_FOUND)
-    METHOD_NOT_ALLOWED = HTTPResponse("Method Not Allowed", {}, HTTPResponseCode.METHOD_NOT_ALLOWED)
-    NOT_ACCEPTABLE = HTTPResponse("Not Acceptable", {}, HTTPResponseCode.NOT_ACCEPTABLE)
-    PROXY_AUTHENTICATION_REQUIRED = HTTPResponse("Proxy Authentication Required", {}, HTTPResponseCode.PROXY_AUTHENTICATION_REQUIRED)
-    REQUEST_TIMEOUT = HTTPResponse("Request Timeout", {}, HTTPResponseCode.REQUEST_TIMEOUT)
-    CONFLICT = HTTPResponse("Conflict", {}, HTTPResponseCode.CONFLICT)
-    GONE = HTTPResponse("Gone", {}, HTTPResponseCode.GONE)
-    LENGTH_REQUIRED = HTTPResponse("Length Required", {}, HTTPResponseCode.LENGTH_REQUIRED)
-    PRECONDITION_FAILED = HTTPResponse("Precondition Failed", {}, HTTPResponseCode.PRECONDITION_FAILED)
-    PAYLOAD_TOO_LARGE = HTTPResponse("Payload Too Large", {}, HTTPResponseCode.PAYLOAD_TOO_LARGE)
-    URI_TOO_LONG = HTTPResponse("URI Too Long", {}, HTTPResponseCode.URI_TOO_LONG)
-    UNSUPPORTED_MEDIA_TYPE = HTTPResponse("Unsupported Media Type", {}, HTTPResponseCode.UNSUPPORTED_MEDIA_TYPE)
-    RANGE_NOT_SATISFIABLE = HTTPResponse("Range Not Satisfiable", {}, HTTPResponseCode.RANGE_NOT_SATISFIABLE)
-    EXPECTATION_FAILED = HTTPResponse("Expectation Failed", {}, HTTPResponseCode.EXPECTATION_FAILED)
-    IM_A_TEAPOT = HTTPResponse("I'm a teapot", {}, HTTPResponseCode.IM_A_TEAPOT)
-    MISDIRECTED_REQUEST = HTTPResponse("Misdirected Request", {}, HTTPResponseCode.MISDIRECTED_REQUEST)
-    UNPROCESSABLE_ENTITY = HTTPResponse("Unprocessable Entity", {}, HTTPResponseCode.UNPROCESSABLE_ENTITY)
-    LOCKED = HTTPResponse("Locked", {}, HTTPResponseCode.LOCKED)
-    FAILED_DEPENDENCY = HTTPResponse("Failed Dependency", {}, HTTPResponseCode.FAILED_DEPENDENCY)
-    TOO_EARLY = HTTPResponse("Too Early", {}, HTTPResponseCode.TOO_EARLY)
-    UPGRADE_REQUIRED = HTTPResponse("Upgrade Required", {}, HTTPResponseCode.UPGRADE_REQUIRED)
-    PRECONDITION_REQUIRED = HTTPResponse("Precondition Required", {}, HTTPResponseCode.PRECONDITION_REQUIRED)
-    TOO_MANY_REQUESTS = HTTPResponse("Too Many Requests", {}, HTTPResponseCode.TOO_MANY_REQUESTS)
-    REQUEST_HEADER_FIELDS_TOO_LARGE = HTTPResponse("Request Header Fields Too Large", {}, HTTPResponseCode.REQUEST_HEADER_FIELDS_TOO_LARGE)
-    UNAVAILABLE_FOR_LEGAL_REASONS = HTTPResponse("Unavailable For Legal Reasons", {}, HTTPResponseCode.UNAVAILABLE_FOR_LEGAL_REASONS)
-    INTERNAL_SERVER_ERROR = HTTPResponse("Internal Server Error", {}, HTTPResponseCode.INTERNAL_SERVER_ERROR)
-    NOT_IMPLEMENTED = HTTPResponse("Not Implemented", {}, HTTPResponseCode.NOT_IMPLEMENTED)
-    BAD_GATEWAY = HTTPResponse("Bad Gateway", {}, HTTPResponseCode.BAD_GATEWAY)
-    SERVICE_UNAVAILABLE = HTTPResponse("Service Unavailable", {}, HTTPResponseCode.SERVICE_UNAVAILABLE)
-    GATEWAY_TIMEOUT = HTTPResponse("Gateway Timeout", {}, HTTPResponseCode.GATEWAY_TIMEOUT)
-    HTTP_VERSION_NOT_SUPPORTED = HTTPResponse("HTTP Version Not Supported", {}, HTTPResponseCode.HTTP_VERSION_NOT_SUPPORTED)
-    VARIANT_ALSO_NEGOTIATES = HTTPResponse("Variant Also Negotiates", {}, HTTPResponseCode.VARIANT_ALSO_NEGOTIATES)
-    INSUFFICIENT_STORAGE = HTTPResponse("Insufficient Storage", {}, HTTPResponseCode.INSUFFICIENT_STORAGE)
-    LOOP_DETECTED = HTTPResponse("Loop Detected", {}, HTTPResponseCode.LOOP_DETECTED)
-    NOT_EXTENDED = HTTPResponse("Not Extended", {}, HTTPResponseCode.NOT_EXTENDED)
-    NETWORK_AUTHENTICATION_REQUIRED = HTTPResponse("Network Authentication Required", {}, HTTPResponseCode.NETWORK_AUTHENTICATION_REQUIRED)
+    """Pre-serialized, immutable error responses."""
+
+    BAD_REQUEST = PreEncodedResponse(HTTPResponse("Bad Request", {}, HTTPResponseCode.BAD_REQUEST))
+    UNAUTHORIZED = PreEncodedResponse(HTTPResponse("Unauthorized", {}, HTTPResponseCode.UNAUTHORIZED))
+    PAYMENT_REQUIRED = PreEncodedResponse(HTTPResponse("Payment Required", {}, HTTPResponseCode.PAYMENT_REQUIRED))
+    FORBIDDEN = PreEncodedResponse(HTTPResponse("Forbidden", {}, HTTPResponseCode.FORBIDDEN))
+    NOT_FOUND = PreEncodedResponse(HTTPResponse("Not Found", {}, HTTPResponseCode.NOT_FOUND))
+    METHOD_NOT_ALLOWED = PreEncodedResponse(HTTPResponse("Method Not Allowed", {}, HTTPResponseCode.METHOD_NOT_ALLOWED))
+    NOT_ACCEPTABLE = PreEncodedResponse(HTTPResponse("Not Acceptable", {}, HTTPResponseCode.NOT_ACCEPTABLE))
+    PROXY_AUTHENTICATION_REQUIRED = PreEncodedResponse(HTTPResponse("Proxy Authentication Required", {}, HTTPResponseCode.PROXY_AUTHENTICATION_REQUIRED))
+    REQUEST_TIMEOUT = PreEncodedResponse(HTTPResponse("Request Timeout", {}, HTTPResponseCode.REQUEST_TIMEOUT))
+    CONFLICT = PreEncodedResponse(HTTPResponse("Conflict", {}, HTTPResponseCode.CONFLICT))
+    GONE = PreEncodedResponse(HTTPResponse("Gone", {}, HTTPResponseCode.GONE))
+    LENGTH_REQUIRED = PreEncodedResponse(HTTPResponse("Length Required", {}, HTTPResponseCode.LENGTH_REQUIRED))
+    PRECONDITION_FAILED = PreEncodedResponse(HTTPResponse("Precondition Failed", {}, HTTPResponseCode.PRECONDITION_FAILED))
+    PAYLOAD_TOO_LARGE = PreEncodedResponse(HTTPResponse("Payload Too Large", {}, HTTPResponseCode.PAYLOAD_TOO_LARGE))
+    URI_TOO_LONG = PreEncodedResponse(HTTPResponse("URI Too Long", {}, HTTPResponseCode.URI_TOO_LONG))
+    UNSUPPORTED_MEDIA_TYPE = PreEncodedResponse(HTTPResponse("Unsupported Media Type", {}, HTTPResponseCode.UNSUPPORTED_MEDIA_TYPE))
+    RANGE_NOT_SATISFIABLE = PreEncodedResponse(HTTPResponse("Range Not Satisfiable", {}, HTTPResponseCode.RANGE_NOT_SATISFIABLE))
+    EXPECTATION_FAILED = PreEncodedResponse(HTTPResponse("Expectation Failed", {}, HTTPResponseCode.EXPECTATION_FAILED))
+    IM_A_TEAPOT = PreEncodedResponse(HTTPResponse("I'm a teapot", {}, HTTPResponseCode.IM_A_TEAPOT))
+    MISDIRECTED_REQUEST = PreEncodedResponse(HTTPResponse("Misdirected Request", {}, HTTPResponseCode.MISDIRECTED_REQUEST))
+    UNPROCESSABLE_ENTITY = PreEncodedResponse(HTTPResponse("Unprocessable Entity", {}, HTTPResponseCode.UNPROCESSABLE_ENTITY))
+    LOCKED = PreEncodedResponse(HTTPResponse("Locked", {}, HTTPResponseCode.LOCKED))
+    FAILED_DEPENDENCY = PreEncodedResponse(HTTPResponse("Failed Dependency", {}, HTTPResponseCode.FAILED_DEPENDENCY))
+    TOO_EARLY = PreEncodedResponse(HTTPResponse("Too Early", {}, HTTPResponseCode.TOO_EARLY))
+    UPGRADE_REQUIRED = PreEncodedResponse(HTTPResponse("Upgrade Required", {}, HTTPResponseCode.UPGRADE_REQUIRED))
+    PRECONDITION_REQUIRED = PreEncodedResponse(HTTPResponse("Precondition Required", {}, HTTPResponseCode.PRECONDITION_REQUIRED))
+    TOO_MANY_REQUESTS = PreEncodedResponse(HTTPResponse("Too Many Requests", {}, HTTPResponseCode.TOO_MANY_REQUESTS))
+    REQUEST_HEADER_FIELDS_TOO_LARGE = PreEncodedResponse(HTTPResponse("Request Header Fields Too Large", {}, HTTPResponseCode.REQUEST_HEADER_FIELDS_TOO_LARGE))
+    UNAVAILABLE_FOR_LEGAL_REASONS = PreEncodedResponse(HTTPResponse("Unavailable For Legal Reasons", {}, HTTPResponseCode.UNAVAILABLE_FOR_LEGAL_REASONS))
+    INTERNAL_SERVER_ERROR = PreEncodedResponse(HTTPResponse("Internal Server Error", {}, HTTPResponseCode.INTERNAL_SERVER_ERROR))
+    NOT_IMPLEMENTED = PreEncodedResponse(HTTPResponse("Not Implemented", {}, HTTPResponseCode.NOT_IMPLEMENTED))
+    BAD_GATEWAY = PreEncodedResponse(HTTPResponse("Bad Gateway", {}, HTTPResponseCode.BAD_GATEWAY))
+    SERVICE_UNAVAILABLE = PreEncodedResponse(HTTPResponse("Service Unavailable", {}, HTTPResponseCode.SERVICE_UNAVAILABLE))
+    GATEWAY_TIMEOUT = PreEncodedResponse(HTTPResponse("Gateway Timeout", {}, HTTPResponseCode.GATEWAY_TIMEOUT))
+    HTTP_VERSION_NOT_SUPPORTED = PreEncodedResponse(HTTPResponse("HTTP Version Not Supported", {}, HTTPResponseCode.HTTP_VERSION_NOT_SUPPORTED))
+    VARIANT_ALSO_NEGOTIATES = PreEncodedResponse(HTTPResponse("Variant Also Negotiates", {}, HTTPResponseCode.VARIANT_ALSO_NEGOTIATES))
+    INSUFFICIENT_STORAGE = PreEncodedResponse(HTTPResponse("Insufficient Storage", {}, HTTPResponseCode.INSUFFICIENT_STORAGE))
+    LOOP_DETECTED = PreEncodedResponse(HTTPResponse("Loop Detected", {}, HTTPResponseCode.LOOP_DETECTED))
+    NOT_EXTENDED = PreEncodedResponse(HTTPResponse("Not Extended", {}, HTTPResponseCode.NOT_EXTENDED))
+    NETWORK_AUTHENTICATION_REQUIRED = PreEncodedResponse(HTTPResponse("Network Authentication Required", {}, HTTPResponseCode.NETWORK_AUTHENTICATION_REQUIRED))
@@ -1,3 +1,30 @@
 class MethodNotAllowed(Exception):
     """Exception raised when a method is not allowed."""
-    pass
\ No newline at end of file
+
+    def __init__(self, message: str, allowed: list | None = None):
+        super().__init__(message)
+        self.allowed = allowed or []
+
+class MalformedRequest(Exception):
+    """Exception raised when a request cannot be parsed."""
+    pass
+
+
+class UnsupportedTransferEncoding(MalformedRequest):
+    """Exception raised when a request uses a transfer coding other than chunked."""
+    pass
+
+
+class HeadersTooLarge(Exception):
+    """Exception raised when the request head exceeds the header size limit."""
+    pass
+
+
+class PayloadTooLarge(Exception):
+    """Exception raised when the request body exceeds the body size limit."""
+    pass
+
+
+class Overloaded(Exception):
+    """Exception raised when admission control refuses a request."""
+    pass
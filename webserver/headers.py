@@ -0,0 +1,54 @@
+from collections.abc import Mapping
+
+
+class Headers(Mapping):
+    """
+    Read-only, case-insensitive view of request headers.
+
+    Lookups ignore case, iteration yields the header names as the client sent
+    them. Repeated headers are joined with ", " (or "; " for Cookie), use
+    `getall` to get the individual values.
+    """
+
+    __slots__ = ("_items", "_index")
+
+    def __init__(self, items: list[tuple[str, str]] = ()):
+        self._items = list(items)
+        self._index: dict[str, str] = {}
+        for name, value in self._items:
+            key = name.lower()
+            if key in self._index:
+                separator = "; " if key == "cookie" else ", "
+                self._index[key] = f"{self._index[key]}{separator}{value}"
+            else:
+                self._index[key] = value
+
+    def __getitem__(self, name: str) -> str:
+        return self._index[name.lower()]
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and name.lower() in self._index
+
+    def get(self, name: str, default=None):
+        return self._index.get(name.lower(), default)
+
+    def getall(self, name: str) -> list[str]:
+        key = name.lower()
+        return [value for n, value in self._items if n.lower() == key]
+
+    def __iter__(self):
+        seen = set()
+        for name, _ in self._items:
+            key = name.lower()
+            if key not in seen:
+                seen.add(key)
+                yield name
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __str__(self):
+        return str(dict(self.items()))
+
+    def __repr__(self):
+        return f"Headers({self._items})"
@@ -51,9 +51,16 @@ class LogFormatter(logging.Formatter):
         logging.CRITICAL: prefix + Colors.LIGHT_PURPLE + msg + suffix + Colors.END,
     }
 
+    def __init__(self):
+        super().__init__()
+        self.formatters = {
+            level: logging.Formatter(log_fmt, '%H:%M:%S')
+            for level, log_fmt in self.FORMATS.items()
+        }
+        self.default_formatter = logging.Formatter(None, '%H:%M:%S')
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt, '%H:%M:%S')
+        formatter = self.formatters.get(record.levelno, self.default_formatter)
         return formatter.format(record)
     
 class LogFileFormatter(logging.Formatter):
@@ -69,7 +76,14 @@ class LogFileFormatter(logging.Formatter):
         logging.CRITICAL: prefix + msg + suffix,
     }
 
+    def __init__(self):
+        super().__init__()
+        self.formatters = {
+            level: logging.Formatter(log_fmt, '%H:%M:%S')
+            for level, log_fmt in self.FORMATS.items()
+        }
+        self.default_formatter = logging.Formatter(None, '%H:%M:%S')
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt, '%H:%M:%S')
+        formatter = self.formatters.get(record.levelno, self.default_formatter)
         return formatter.format(record)
\ No newline at end of file
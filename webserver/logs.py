@@ -0,0 +1,142 @@
+import os
+import sys
+import atexit
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+from webserver.log_formatter import LogFormatter, LogFileFormatter
+
+logger = logging.getLogger("webserver")
+access_logger = logging.getLogger("webserver.access")
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock QueueHandler merges the message arguments and formats the
+    exception text before enqueueing, on the thread that logged. Records never
+    leave this process here, so they can be queued as they are.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that doesn't flush after every record."""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that doesn't flush after every record."""
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    QueueListener that takes every record waiting in the queue (up to
+    `max_batch`), hands them to the handlers and then flushes each handler
+    once, so a burst of requests costs one write instead of one per line.
+    """
+
+    def __init__(self, queue, *handlers, max_batch: int = 512):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.max_batch = max_batch
+
+    def _monitor(self):
+        q = self.queue
+        has_task_done = hasattr(q, "task_done")
+        stopping = False
+        while not stopping:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    self.handle(record)
+                if has_task_done:
+                    q.task_done()
+
+            for handler in self.handlers:
+                handler.flush()
+
+
+_listener: BatchingQueueListener | None = None
+_queue_handler: LazyQueueHandler | None = None
+
+
+def configure(
+    level: int = logging.INFO,
+    access_log: bool = True,
+    log_file: str | None = "webserver.log",
+):
+    """
+    Send the server's logs to the console and `log_file` through a background
+    thread, so writing them never blocks the event loop.
+    """
+    global _listener, _queue_handler
+    stop()
+
+    handlers: list[logging.Handler] = []
+    console_handler = BufferedStreamHandler(sys.stderr)
+    console_handler.setFormatter(LogFormatter())
+    handlers.append(console_handler)
+    if log_file is not None:
+        file_handler = BufferedFileHandler(log_file, delay=True)
+        file_handler.setFormatter(LogFileFormatter())
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = LazyQueueHandler(log_queue)
+    _listener = BatchingQueueListener(log_queue, *handlers)
+
+    logger.handlers = [_queue_handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    access_logger.disabled = not access_log
+
+    _listener.start()
+
+
+def stop():
+    """Flush and stop the background log thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork():
+    # The listener thread doesn't survive a fork, give the child its own
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = BatchingQueueListener(log_queue, *_listener.handlers)
+    _listener.start()
+
+
+atexit.register(stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,176 @@
+from array import array
+from bisect import bisect_left
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Status counters are indexed by code - MIN_STATUS
+MIN_STATUS = 100
+STATUS_RANGE = 500
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Request metrics for one server process.
+
+    Every (route, method) pair gets a slot the first time it is seen. A slot
+    is a fixed block in a few flat arrays: one counter per status code and
+    one per latency bucket, plus the sum of latencies. Recording a request
+    only indexes into them, nothing is allocated.
+
+    `route` is the route template (`/users/{id}`), so path variables don't
+    create new series. Requests that matched no route use an empty string.
+    With several workers each process has its own metrics.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._width = len(self.buckets) + 1  # the last bucket is +Inf
+        self._slots: dict[tuple[str, str], int] = {}
+        self._status_counts = array("Q")
+        self._bucket_counts = array("Q")
+        self._duration_sums = array("d")
+
+        self.in_flight = 0
+        self.open_connections = 0
+        self.connections_total = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        # A RouteCache whose counters are included, set by the server
+        self.route_cache = None
+        # An AdmissionController whose counters are included, set by the server
+        self.admission = None
+        # A Watchdog whose counters are included, set by the server
+        self.watchdog = None
+
+    def _add_slot(self, key: tuple[str, str]) -> int:
+        slot = len(self._slots)
+        self._slots[key] = slot
+        self._status_counts.frombytes(bytes(STATUS_RANGE * self._status_counts.itemsize))
+        self._bucket_counts.frombytes(bytes(self._width * self._bucket_counts.itemsize))
+        self._duration_sums.append(0.0)
+        return slot
+
+    def observe(self, route: str, method: str, status: int, duration: float):
+        """Record a request to `route` that got `status` after `duration` seconds."""
+        key = (route, method)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._add_slot(key)
+
+        if MIN_STATUS <= status < MIN_STATUS + STATUS_RANGE:
+            self._status_counts[slot * STATUS_RANGE + status - MIN_STATUS] += 1
+        self._bucket_counts[slot * self._width + bisect_left(self.buckets, duration)] += 1
+        self._duration_sums[slot] += duration
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP webserver_requests_total Requests handled, by route, method and status.",
+            "# TYPE webserver_requests_total counter",
+        ]
+        for (route, method), slot in self._slots.items():
+            labels = f'route="{_escape(route)}",method="{method}"'
+            base = slot * STATUS_RANGE
+            for offset in range(STATUS_RANGE):
+                count = self._status_counts[base + offset]
+                if count:
+                    status = offset + MIN_STATUS
+                    lines.append(
+                        f'webserver_requests_total{{{labels},status="{status}"}} {count}'
+                    )
+
+        lines += [
+            "# HELP webserver_request_duration_seconds Time from parsing a request to sending the response.",
+            "# TYPE webserver_request_duration_seconds histogram",
+        ]
+        bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+        for (route, method), slot in self._slots.items():
+            labels = f'route="{_escape(route)}",method="{method}"'
+            base = slot * self._width
+            cumulative = 0
+            for i, bound in enumerate(bounds):
+                cumulative += self._bucket_counts[base + i]
+                lines.append(
+                    f'webserver_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f"webserver_request_duration_seconds_sum{{{labels}}} {self._duration_sums[slot]}"
+            )
+            lines.append(f"webserver_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            "# HELP webserver_requests_in_flight Requests being handled right now.",
+            "# TYPE webserver_requests_in_flight gauge",
+            f"webserver_requests_in_flight {self.in_flight}",
+            "# HELP webserver_open_connections Open client connections.",
+            "# TYPE webserver_open_connections gauge",
+            f"webserver_open_connections {self.open_connections}",
+            "# HELP webserver_connections_total Client connections accepted.",
+            "# TYPE webserver_connections_total counter",
+            f"webserver_connections_total {self.connections_total}",
+            "# HELP webserver_received_bytes_total Bytes read from clients.",
+            "# TYPE webserver_received_bytes_total counter",
+            f"webserver_received_bytes_total {self.bytes_received}",
+            "# HELP webserver_sent_bytes_total Bytes written to clients.",
+            "# TYPE webserver_sent_bytes_total counter",
+            f"webserver_sent_bytes_total {self.bytes_sent}",
+        ]
+
+        admission = self.admission
+        if admission is not None:
+            lines += [
+                "# HELP webserver_shed_total Connections and requests rejected with 503, by reason.",
+                "# TYPE webserver_shed_total counter",
+            ]
+            for reason, count in admission.shed.items():
+                lines.append(f'webserver_shed_total{{reason="{reason}"}} {count}')
+            if admission.max_loop_lag is not None:
+                lines += [
+                    "# HELP webserver_event_loop_lag_seconds How late the event loop last woke up.",
+                    "# TYPE webserver_event_loop_lag_seconds gauge",
+                    f"webserver_event_loop_lag_seconds {admission.loop_lag}",
+                ]
+
+        watchdog = self.watchdog
+        if watchdog is not None:
+            for name, counts, help_text in (
+                ("loop_stalls", watchdog.stalls, "Event loop stalls, by the route that was running."),
+                ("slow_handlers", watchdog.slow_handlers, "Handlers slower than the latency budget."),
+            ):
+                lines += [
+                    f"# HELP webserver_{name}_total {help_text}",
+                    f"# TYPE webserver_{name}_total counter",
+                ]
+                for route, count in list(counts.items()):
+                    lines.append(f'webserver_{name}_total{{route="{_escape(route)}"}} {count}')
+
+        cache = self.route_cache
+        if cache is not None:
+            for name, value, help_text in (
+                ("hits", cache.hits, "Responses served from the route cache."),
+                ("misses", cache.misses, "Route cache misses that called the handler."),
+                ("coalesced", cache.coalesced, "Misses that waited for a handler call already running."),
+                ("evictions", cache.evictions, "Entries evicted to stay within the size limit."),
+                ("expirations", cache.expirations, "Entries dropped because their TTL ran out."),
+            ):
+                lines += [
+                    f"# HELP webserver_route_cache_{name}_total {help_text}",
+                    f"# TYPE webserver_route_cache_{name}_total counter",
+                    f"webserver_route_cache_{name}_total {value}",
+                ]
+            lines += [
+                "# HELP webserver_route_cache_bytes Size of the cached responses.",
+                "# TYPE webserver_route_cache_bytes gauge",
+                f"webserver_route_cache_bytes {cache.size}",
+                "# HELP webserver_route_cache_entries Number of cached responses.",
+                "# TYPE webserver_route_cache_entries gauge",
+                f"webserver_route_cache_entries {len(cache.entries)}",
+            ]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,183 @@
+from collections.abc import Callable
+from typing import Optional
+
+from webserver.exceptions import (
+    MalformedRequest,
+    UnsupportedTransferEncoding,
+    HeadersTooLarge,
+    PayloadTooLarge,
+)
+
+_HEX_DIGITS = b"0123456789abcdefABCDEF"
+
+
+class RequestParser:
+    """
+    Incremental HTTP/1.x request parser.
+
+    Bytes are fed in as they arrive from the socket and complete requests are
+    handed back as (head, body) pairs. The parser never holds more than the
+    header size limit while waiting for a request head, and never more than the
+    body size limit while reading a body, so memory per connection stays bounded.
+    Extra bytes after a request (pipelined requests) are kept for the next call.
+
+    `on_head` is called with each request head once it is complete, before any
+    of its body is read. An exception it raises propagates from next_request,
+    so a request can be refused without waiting for its body.
+    """
+
+    def __init__(
+        self,
+        max_header_size: int,
+        max_body_size: int,
+        on_head: Optional[Callable[[bytes], None]] = None,
+    ):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.on_head = on_head
+        self.buffer = bytearray()
+        self._reset()
+
+    def _reset(self):
+        self._head: bytes | None = None
+        self._content_length = 0
+        self._chunked = False
+        self._chunks = bytearray()
+        self._chunks_done = False
+
+    def feed(self, data: bytes):
+        self.buffer += data
+
+    @property
+    def idle(self) -> bool:
+        """True if no part of a request has been received yet."""
+        return self._head is None and not self.buffer.strip(b"\r\n")
+
+    @property
+    def reading_body(self) -> bool:
+        return self._head is not None
+
+    def next_request(self) -> tuple[bytes, bytes] | None:
+        """Return the next complete (head, body) pair, or None if more data is needed."""
+        if self._head is None and not self._parse_head():
+            return None
+
+        if self._chunked:
+            if not self._parse_chunks():
+                return None
+            body = bytes(self._chunks)
+        else:
+            if len(self.buffer) < self._content_length:
+                return None
+            body = bytes(self.buffer[: self._content_length])
+            del self.buffer[: self._content_length]
+
+        head = self._head
+        self._reset()
+        return head, body
+
+    def _parse_head(self) -> bool:
+        # Tolerate empty lines between pipelined requests (RFC 9112 section 2.2)
+        while self.buffer.startswith(b"\r\n"):
+            del self.buffer[:2]
+
+        end = self.buffer.find(b"\r\n\r\n", 0, self.max_header_size + 4)
+        if end == -1:
+            if len(self.buffer) > self.max_header_size:
+                raise HeadersTooLarge(
+                    f"Request head exceeds {self.max_header_size} bytes"
+                )
+            return False
+
+        head = bytes(self.buffer[:end])
+        del self.buffer[: end + 4]
+
+        content_length = None
+        transfer_encoding = None
+        for line in head.split(b"\r\n")[1:]:
+            name, sep, value = line.partition(b":")
+            if not sep:
+                raise MalformedRequest(f"Invalid header line {line!r}")
+            # No whitespace around the name (RFC 9112 section 5.1), a proxy
+            # might read "Content-Length : 5" differently than we do.
+            if not name or name != name.strip():
+                raise MalformedRequest(f"Invalid header name {name!r}")
+            name = name.lower()
+            if name == b"content-length":
+                if content_length is not None:
+                    raise MalformedRequest("Multiple Content-Length headers")
+                # int() would also take "+5", "0_5" or non-ASCII digits
+                value = value.strip()
+                if not value.isdigit():
+                    raise MalformedRequest(f"Invalid Content-Length {value!r}")
+                content_length = int(value)
+            elif name == b"transfer-encoding":
+                if transfer_encoding is not None:
+                    raise MalformedRequest("Multiple Transfer-Encoding headers")
+                transfer_encoding = value.strip().lower()
+
+        if transfer_encoding is not None:
+            # Only a lone "chunked", bodies in other codings (gzip, chunked)
+            # would reach the handler still encoded.
+            if transfer_encoding != b"chunked":
+                raise UnsupportedTransferEncoding(
+                    f"Unsupported Transfer-Encoding {transfer_encoding!r}"
+                )
+            if content_length is not None:
+                raise MalformedRequest("Both Content-Length and Transfer-Encoding set")
+            self._chunked = True
+        elif content_length is not None:
+            if content_length > self.max_body_size:
+                raise PayloadTooLarge(
+                    f"Content-Length {content_length} exceeds {self.max_body_size} bytes"
+                )
+            self._content_length = content_length
+
+        if self.on_head is not None:
+            self.on_head(head)
+        self._head = head
+        return True
+
+    def _parse_chunks(self) -> bool:
+        while not self._chunks_done:
+            end = self.buffer.find(b"\r\n")
+            if end == -1:
+                if len(self.buffer) > self.max_header_size:
+                    raise MalformedRequest("Chunk size line too long")
+                return False
+            size_line = bytes(self.buffer[:end]).split(b";")[0].strip()
+            # int(x, 16) would also take "0x5", "+5" or "0_5"
+            if not size_line or size_line.lstrip(_HEX_DIGITS):
+                raise MalformedRequest(f"Invalid chunk size {size_line!r}")
+            size = int(size_line, 16)
+
+            if size == 0:
+                del self.buffer[: end + 2]
+                self._chunks_done = True
+                break
+
+            if len(self._chunks) + size > self.max_body_size:
+                raise PayloadTooLarge(
+                    f"Chunked body exceeds {self.max_body_size} bytes"
+                )
+            if len(self.buffer) < end + 2 + size + 2:
+                return False
+            start = end + 2
+            if self.buffer[start + size : start + size + 2] != b"\r\n":
+                raise MalformedRequest("Chunk data not terminated by CRLF")
+            self._chunks += self.buffer[start : start + size]
+            del self.buffer[: start + size + 2]
+
+        # Skip the (ignored) trailer section, which ends with an empty line
+        if self.buffer.startswith(b"\r\n"):
+            del self.buffer[:2]
+            return True
+        end = self.buffer.find(b"\r\n\r\n", 0, self.max_header_size + 4)
+        if end == -1:
+            if len(self.buffer) > self.max_header_size:
+                raise HeadersTooLarge(
+                    f"Trailer section exceeds {self.max_header_size} bytes"
+                )
+            return False
+        del self.buffer[: end + 4]
+        return True
@@ -0,0 +1,159 @@
+import io
+import os
+import re
+import cProfile
+import marshal
+import pstats
+import tracemalloc
+from collections import Counter
+from collections.abc import Coroutine, Iterable
+
+from webserver.enums import HTTPRequest
+
+
+class _Profiled:
+    """
+    Awaitable that runs `coro` with `profile` enabled only while the coroutine
+    itself is executing. Whatever other tasks do while it waits stays out of
+    its profile.
+    """
+
+    def __init__(self, coro: Coroutine, profile: cProfile.Profile):
+        self.coro = coro
+        self.profile = profile
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            self.profile.enable()
+            try:
+                if error is None:
+                    future = self.coro.send(value)
+                else:
+                    future = self.coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profile.disable()
+
+            try:
+                value, error = (yield future), None
+            except BaseException as e:
+                value, error = None, e
+
+
+class Profiler:
+    """
+    Samples requests with cProfile and aggregates the stats per route.
+
+    Every `sample_rate`-th request is profiled (0 profiles none), as is any
+    request carrying the `header` from one of the `trusted` addresses (the
+    socket peer, forwarded headers are ignored). Only
+    time spent in the request's own coroutine is recorded, handlers run in an
+    executor show up as time spent waiting for it.
+
+    With `trace_memory`, tracemalloc runs for the whole process and each
+    profiled request also records the memory allocated per source line.
+    Other requests running at the same time can add to those numbers.
+
+    Stats can be read with `report()`, fetched from the server's profile
+    endpoint, or written as .pstats files with `dump()`. If `output_dir` is
+    set they are dumped when the server stops.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 0,
+        header: str | None = "X-Profile",
+        trusted: Iterable[str] = ("127.0.0.1", "::1"),
+        trace_memory: bool = False,
+        output_dir: str | None = None,
+    ):
+        self.sample_rate = sample_rate
+        self.header = header
+        self.trusted = frozenset(trusted)
+        self.trace_memory = trace_memory
+        self.output_dir = output_dir
+        self.stats: dict[str, pstats.Stats] = {}
+        self.samples: Counter[str] = Counter()
+        self.allocations: dict[str, Counter[str]] = {}
+        self._requests = 0
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def should_profile(self, request: HTTPRequest) -> bool:
+        if self.sample_rate > 0:
+            self._requests += 1
+            if self._requests >= self.sample_rate:
+                self._requests = 0
+                return True
+        return (
+            self.header is not None
+            and self.header in request.headers
+            and request.peer_address[0] in self.trusted
+        )
+
+    async def run(self, request: HTTPRequest, coro: Coroutine):
+        """Await `coro`, the handling of `request`, under the profiler."""
+        profile = cProfile.Profile()
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        try:
+            return await _Profiled(coro, profile)
+        finally:
+            route = request.route or ""
+            self.samples[route] += 1
+            if route in self.stats:
+                self.stats[route].add(profile)
+            else:
+                self.stats[route] = pstats.Stats(profile)
+
+            if snapshot is not None:
+                diff = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+                allocations = self.allocations.setdefault(route, Counter())
+                for stat in diff:
+                    if stat.size_diff > 0:
+                        allocations[str(stat.traceback[0])] += stat.size_diff
+
+    def report(self, route: str | None = None, limit: int = 30, sort: str = "cumulative") -> str:
+        """The top `limit` functions per route (or just `route`) as text."""
+        out = io.StringIO()
+        routes = [route] if route is not None else sorted(self.stats)
+        for name in routes:
+            stats = self.stats.get(name)
+            if stats is None:
+                continue
+            out.write(f"=== {name or '(no route)'}: {self.samples[name]} profiled requests\n")
+            stats.stream = out
+            stats.sort_stats(sort).print_stats(limit)
+
+            allocations = self.allocations.get(name)
+            if allocations:
+                out.write("Top allocations (bytes):\n")
+                for location, size in allocations.most_common(limit):
+                    out.write(f"{size:>12}  {location}\n")
+                out.write("\n")
+        return out.getvalue()
+
+    def pstats_bytes(self, route: str) -> bytes | None:
+        """The stats for `route` in the .pstats file format."""
+        stats = self.stats.get(route)
+        return marshal.dumps(stats.stats) if stats is not None else None
+
+    def dump(self, directory: str | None = None) -> list[str]:
+        """Write one .pstats file per route to `directory`, returns their paths."""
+        directory = directory or self.output_dir
+        if directory is None:
+            raise ValueError("No directory to dump the profiles to")
+        os.makedirs(directory, exist_ok=True)
+
+        paths = []
+        for route, stats in self.stats.items():
+            slug = "unmatched"
+            if route:
+                slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", route).strip("_") or "root"
+            path = os.path.join(directory, f"{slug}.{os.getpid()}.pstats")
+            stats.dump_stats(path)
+            paths.append(path)
+        return paths
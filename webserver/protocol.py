@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import sys
+import time
+from collections.abc import Coroutine
+from typing import TYPE_CHECKING, Optional
+
+from webserver.connection import Connection
+from webserver.enums import HTTPMethod, HTTPError, HTTPRequest, HTTPResponse
+from webserver.exceptions import (
+    MalformedRequest,
+    HeadersTooLarge,
+    PayloadTooLarge,
+    Overloaded,
+)
+from webserver.parser import RequestParser
+
+if TYPE_CHECKING:
+    from webserver.webserver import Webserver
+
+logger = logging.getLogger(__name__)
+
+
+if sys.version_info >= (3, 12):
+
+    def _start_task(coro: Coroutine) -> asyncio.Task:
+        # Runs up to the first suspension right away, a handler that never
+        # suspends is done before this returns
+        return asyncio.Task(coro, loop=asyncio.get_running_loop(), eager_start=True)
+
+else:
+
+    def _start_task(coro: Coroutine) -> asyncio.Task:
+        return asyncio.get_running_loop().create_task(coro)
+
+
+class HTTPProtocol(asyncio.Protocol):
+    """
+    Serves one connection from the event loop's transport callbacks, for
+    Webserver(engine="protocol").
+
+    Requests are parsed in `data_received`, without a StreamReader or a task
+    waiting on it, and each request is handled in a task of its own like any
+    asyncio code expects. On Python 3.12+ that task starts eagerly, so a
+    handler that returns without suspending is answered before
+    `data_received` returns. Reading from the client is paused while a
+    request is handled. Routing, handlers, caching, compression and metrics
+    are shared with the streams engine.
+
+    Deadlines use the server's TimerWheel like the streams engine.
+    """
+
+    def __init__(self, server: "Webserver"):
+        self.server = server
+        self.parser = RequestParser(
+            server.max_header_size, server.max_body_size, server._admit_head
+        )
+        self.transport: Optional[asyncio.Transport] = None
+        self.connection: Optional[Connection] = None
+        # Handling the current request, if it didn't finish right away
+        self.task: Optional[asyncio.Task] = None
+        self._paused = False  # Write buffer above the high water mark
+        self._drain_waiter: Optional[asyncio.Future] = None
+        self._eof = False
+        self._lost = False
+        self._rejected = False  # Answered with a 503, discarding what arrives
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+        server = self.server
+        if not server.admission.accept_connection(len(server.connections)):
+            self._reject()
+            return
+
+        self.connection = Connection(None, self, self._timeout)
+        server.connections.add(self.connection)
+        server.metrics.open_connections += 1
+        server.metrics.connections_total += 1
+        transport.set_write_buffer_limits(server.write_buffer_high, server.write_buffer_low)
+        self._arm_timer()
+
+    def data_received(self, data: bytes):
+        if self._rejected:
+            return
+        self.server.metrics.bytes_received += len(data)
+        self.parser.feed(data)
+        self._process()
+
+    def eof_received(self) -> bool:
+        self._eof = True
+        if self._rejected:
+            self.transport.close()
+        elif self.task is None:
+            self._process()
+        # Stay half-open to answer the requests already received
+        return True
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._lost = True
+        self._wake_writer()
+        connection = self.connection
+        if connection is None:
+            return
+        logger.debug("Connection to %s lost", connection.client_address)
+        self.server.timers.cancel(connection.timer)
+        self.server.connections.discard(connection)
+        self.server.metrics.open_connections -= 1
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_writer()
+
+    # The parts of asyncio.StreamWriter that Webserver._send uses
+
+    def write(self, data: bytes):
+        self.transport.write(data)
+
+    def writelines(self, data):
+        self.transport.writelines(data)
+
+    def get_extra_info(self, name: str, default=None):
+        return self.transport.get_extra_info(name, default)
+
+    async def drain(self):
+        if self._lost:
+            raise ConnectionResetError("Connection lost")
+        if not self._paused:
+            return
+        self._drain_waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._drain_waiter
+        finally:
+            self._drain_waiter = None
+
+    def _wake_writer(self):
+        waiter = self._drain_waiter
+        if waiter is None or waiter.done():
+            return
+        if self._lost:
+            waiter.set_exception(ConnectionResetError("Connection lost"))
+        else:
+            waiter.set_result(None)
+
+    def _process(self):
+        """Handle the complete requests in the buffer, until one has to wait."""
+        server = self.server
+        connection = self.connection
+        transport = self.transport
+        while self.task is None and not transport.is_closing():
+            try:
+                message = self.parser.next_request()
+            except (HeadersTooLarge, PayloadTooLarge, MalformedRequest) as e:
+                self._close_with(server._parse_error(e, connection.client_address))
+                return
+            except Overloaded:
+                logger.warning("Overloaded, rejecting request from %s", connection.client_address)
+                server.timers.cancel(connection.timer)
+                self._reject()
+                return
+            if message is None:
+                break
+            server.timers.cancel(connection.timer)
+            self._dispatch(message)
+
+        if transport.is_closing():
+            return
+        if self.task is not None:
+            # Backpressure: take no more requests until this one is answered
+            transport.pause_reading()
+            return
+        if self._eof:
+            if self.parser.idle:
+                transport.close()
+            else:
+                error = MalformedRequest("Connection closed mid-request")
+                self._close_with(server._parse_error(error, connection.client_address))
+            return
+        transport.resume_reading()
+        self._arm_timer()
+
+    def _dispatch(self, message: tuple[bytes, bytes]):
+        server = self.server
+        connection = self.connection
+        request = server._admit(connection, message)
+        if isinstance(request, HTTPResponse):
+            self._close_with(request)
+            return
+        keep_alive = (
+            server._keep_alive(request)
+            and connection.requests_served < server.max_keep_alive_requests
+        )
+
+        task = _start_task(self._serve(request, keep_alive))
+        if task.done():
+            self._finished(task)
+        else:
+            self.task = task
+            task.add_done_callback(self._task_done)
+
+    async def _serve(self, request: HTTPRequest, keep_alive: bool):
+        server = self.server
+        connection = self.connection
+        connection.task = asyncio.current_task()
+        server.metrics.in_flight += 1
+        connection.request = request
+        started = time.perf_counter()
+        try:
+            response, keep_alive = await server._respond(connection, request, keep_alive)
+            await server._send(self, response, keep_alive, request.method == HTTPMethod.HEAD)
+        finally:
+            server.metrics.in_flight -= 1
+            connection.request = None
+            connection.task = None
+        server._log_request(request, response, started)
+
+        if not keep_alive:
+            self.transport.close()
+
+    def _task_done(self, task: asyncio.Task):
+        self.task = None
+        if self._finished(task):
+            self._process()
+
+    def _finished(self, task: asyncio.Task) -> bool:
+        """Whether `task` handled its request, the connection is aborted if not."""
+        if task.cancelled():
+            self.transport.abort()
+            return False
+        error = task.exception()
+        if error is None:
+            return True
+        if isinstance(error, ConnectionError):
+            logger.debug("Connection to %s lost", self.connection.client_address)
+        else:
+            logger.error("Error serving request", exc_info=error)
+        self.transport.abort()
+        return False
+
+    def _write(self, response: HTTPResponse):
+        chunks = response.encode(False)
+        self.transport.writelines(chunks)
+        self.server.metrics.bytes_sent += sum(map(len, chunks))
+
+    def _close_with(self, response: HTTPResponse):
+        self._write(response)
+        self.transport.close()
+
+    def _reject(self):
+        """Answer with a 503 and close, without reading the rest of the request."""
+        self._rejected = True
+        self._write(self.server.admission.response)
+        if self.transport.can_write_eof():
+            self.transport.write_eof()
+        # Wait briefly for the client to close first, like the streams engine
+        asyncio.get_running_loop().call_later(1.0, self.transport.close)
+
+    def _arm_timer(self):
+        """Set the deadline for receiving the rest of the current or the next request."""
+        server = self.server
+        connection = self.connection
+        if self.parser.reading_body:
+            # Restarted by every read
+            phase, timeout = "body", server.body_timeout
+        elif self.parser.idle and connection.requests_served > 0:
+            phase, timeout = "idle", server.keep_alive_timeout
+        else:
+            phase, timeout = "header", server.header_timeout
+        if phase == "body" or phase != connection.phase or not connection.timer.scheduled:
+            connection.phase = phase
+            server.timers.schedule(connection.timer, timeout)
+
+    def _timeout(self):
+        connection = self.connection
+        if connection.phase == "handler":
+            # Like the streams engine, _run_handler answers with a 503
+            if connection.task is not None:
+                connection.timed_out = True
+                connection.task.cancel()
+        elif connection.phase == "idle":
+            self.transport.close()
+        else:
+            logger.warning(
+                "Timed out receiving request %s from %s", connection.phase, connection.client_address
+            )
+            self._close_with(HTTPError.REQUEST_TIMEOUT)
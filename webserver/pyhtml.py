@@ -1,5 +1,210 @@
+import re
+from collections.abc import AsyncIterable as _AsyncIterable, Iterable as _Iterable
+from functools import partial as _partial
+from html import escape as _escape
+from inspect import isawaitable as _isawaitable
+
+
 def _attr_str(attr: dict):
-    return " ".join([f'{key}="{value}"' for key, value in attr.items()])
+    return " ".join([f'{key}="{_escape(str(value))}"' for key, value in attr.items()])
+
+
+# Placeholders render as markers that survive the tag functions and attribute
+# escaping unchanged, so a Template can find them in the finished markup.
+_PLACEHOLDER_RE = re.compile("\x00([A-Za-z_][A-Za-z0-9_]*)(!?)\x00")
+
+
+class Placeholder:
+    """
+    A dynamic value in a Template. Values are HTML-escaped when the template
+    is rendered, unless `raw` is set, in which case they are inserted as they
+    are and may also be an iterable of strings (e.g. rendered rows).
+    """
+
+    def __init__(self, name: str, raw: bool = False):
+        if not name.isidentifier():
+            raise ValueError(f"Placeholder name must be an identifier, got {name!r}")
+        self.name = name
+        self.raw = raw
+
+    def __str__(self):
+        return f"\x00{self.name}{'!' if self.raw else ''}\x00"
+
+
+class Template:
+    """
+    Markup built once with the tag functions, with Placeholders for the parts
+    that change between requests:
+
+        page = Template(html(body(h1(Placeholder("title")), ul(Placeholder("items", raw=True)))))
+        page.render(title="Orders", items=[li(order) for order in orders])
+
+    Everything between placeholders is kept as pre-rendered strings, so
+    rendering only fills in the values and joins the list once. Templates can
+    be used as children of other tags and templates, their placeholders carry
+    over.
+    """
+
+    def __init__(self, markup):
+        self.source = str(markup)
+        pieces = _PLACEHOLDER_RE.split(self.source)
+        # pieces alternates static text, placeholder name and raw flag
+        self._parts: list[str] = []
+        self._slots: list[tuple[int, str, bool]] = []
+        for i in range(0, len(pieces) - 1, 3):
+            self._parts.append(pieces[i])
+            self._slots.append((len(self._parts), pieces[i + 1], pieces[i + 2] == "!"))
+            self._parts.append("")
+        self._parts.append(pieces[-1])
+        self.placeholders = frozenset(name for _, name, _ in self._slots)
+
+    def render(self, **values) -> str:
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise TypeError(f"Missing values for placeholders: {', '.join(sorted(missing))}")
+
+        parts = self._parts.copy()
+        for index, name, raw in self._slots:
+            value = values[name]
+            if not raw:
+                parts[index] = _escape(str(value))
+            elif isinstance(value, str):
+                parts[index] = value
+            else:
+                parts[index] = "".join([str(item) for item in value])
+        return "".join(parts)
+
+    def __str__(self):
+        return self.source
+
+
+VOID_TAGS = frozenset(
+    ["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"]
+)
+
+# Stream buffers are sent once they reach this many characters
+STREAM_FLUSH_SIZE = 1024 * 16
+
+
+class _Flush:
+    pass
+
+
+_FLUSH = _Flush()
+
+
+class Element:
+    """
+    A lazily rendered tag. Unlike the tag functions, which return strings
+    straight away, an Element keeps its children and renders them on demand:
+    all at once with str(), piece by piece with chunks(), or as an async
+    stream with stream(). `lazy.div(...)` is the same as `Element("div", ...)`.
+
+    Children can be strings, other Elements, Templates, iterables of these
+    and, for stream(), awaitables and async iterables. When stream() reaches
+    one of those it first sends everything rendered so far, so the client
+    gets the <head> and the top of the page while the slow parts load.
+    """
+
+    __slots__ = ("tag", "content", "attr", "meta")
+
+    def __init__(self, tag: str, *content, attr: dict | None = None, meta: str = ""):
+        self.tag = tag
+        self.content = content
+        self.attr = attr or {}
+        self.meta = meta
+
+    def _open(self) -> str:
+        doctype = "<!DOCTYPE html>" if self.tag == "html" else ""
+        return f"{doctype}<{self.tag} {_attr_str(self.attr)} {self.meta}>"
+
+    def _close(self) -> str:
+        return "" if self.tag in VOID_TAGS else f"</{self.tag}>"
+
+    def chunks(self):
+        """Render the element as a generator of strings."""
+        return _walk(self)
+
+    async def stream(self, flush_size: int = STREAM_FLUSH_SIZE):
+        """
+        Render the element as an async generator of strings. Output is
+        buffered up to `flush_size` characters, and flushed early whenever
+        rendering has to wait for an awaitable or async iterable child.
+        """
+        buffer: list[str] = []
+        size = 0
+        async for piece in _walk_async(self):
+            if piece is _FLUSH:
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+                continue
+            buffer.append(piece)
+            size += len(piece)
+            if size >= flush_size:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+
+    def __str__(self):
+        return "".join(_walk(self))
+
+
+def _walk(node):
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, Element):
+        yield node._open()
+        for child in node.content:
+            yield from _walk(child)
+        yield node._close()
+    elif _isawaitable(node) or isinstance(node, _AsyncIterable):
+        raise TypeError(f"{node!r} can only be rendered with Element.stream()")
+    elif isinstance(node, _Iterable):
+        for child in node:
+            yield from _walk(child)
+    else:
+        yield str(node)
+
+
+async def _walk_async(node):
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, Element):
+        yield node._open()
+        for child in node.content:
+            async for piece in _walk_async(child):
+                yield piece
+        yield node._close()
+    elif _isawaitable(node):
+        yield _FLUSH
+        async for piece in _walk_async(await node):
+            yield piece
+    elif isinstance(node, _AsyncIterable):
+        yield _FLUSH
+        async for child in node:
+            async for piece in _walk_async(child):
+                yield piece
+            yield _FLUSH
+    elif isinstance(node, _Iterable):
+        for child in node:
+            async for piece in _walk_async(child):
+                yield piece
+    else:
+        yield str(node)
+
+
+class _LazyTags:
+    def __getattr__(self, tag: str):
+        if tag.startswith("_"):
+            raise AttributeError(tag)
+        return _partial(Element, tag)
+
+
+# lazy.<tag>(*content, attr=..., meta=...) builds an Element for any tag
+lazy = _LazyTags()
+
 
 def html(*content, attr={}, meta=''):
     return f"<!DOCTYPE html><html {_attr_str(attr)} {meta}>{''.join([str(c) for c in content])}</html>"
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from webserver.enums import (
+    HTTPRequest,
+    HTTPResponse,
+    HTTPResponseCode,
+    PreEncodedResponse,
+    FileResponse,
+    StreamingResponse,
+)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    How responses of a route are cached: for `ttl` seconds, keyed on the
+    method, the path, the query parameters in `params` (the whole query string
+    if None) and the request headers in `headers`.
+    """
+
+    ttl: float
+    params: tuple[str, ...] | None = None
+    headers: tuple[str, ...] = ()
+
+    def __post_init__(self):
+        if self.ttl <= 0:
+            raise ValueError("cache_ttl must be positive")
+
+    def key(self, request: HTTPRequest, encoding: str | None) -> tuple:
+        if self.params is None:
+            query = request.query_string
+        else:
+            params = request.query_params_all
+            query = tuple(tuple(params.get(name, ())) for name in self.params)
+        headers = tuple(request.headers.get(name) for name in self.headers)
+        return (request.method, request.path, query, headers, encoding)
+
+
+class CachedResponse:
+    __slots__ = ("response", "expires_at", "size")
+
+    def __init__(self, response: PreEncodedResponse, expires_at: float):
+        self.response = response
+        self.expires_at = expires_at
+        self.size = len(response.head) + len(response.body)
+
+
+class RouteCache:
+    """
+    LRU cache of serialized responses for routes registered with `cache_ttl`.
+
+    Only 200 responses without Set-Cookie are stored. Once the cache holds
+    more than `max_size` bytes the least recently used entries are evicted.
+    Concurrent misses for the same key share one handler call: the first
+    request computes the response and the others wait for it. Responses
+    that can only be sent once, like streams, aren't shared, the waiters
+    then call the handler themselves.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self.size = 0
+        self._pending: dict[tuple, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # misses that waited for another request's handler call
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key: tuple) -> PreEncodedResponse | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self.expirations += 1
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry.response
+
+    async def get(
+        self,
+        key: tuple,
+        ttl: float,
+        compute: Callable[[], Awaitable[HTTPResponse]],
+    ) -> HTTPResponse:
+        """The cached response for `key`, calling `compute` on a miss."""
+        while True:
+            response = self._lookup(key)
+            if response is not None:
+                self.hits += 1
+                return response
+
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            try:
+                self.coalesced += 1
+                response = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request computing it went away, take over
+                continue
+            if response is not None:
+                return response
+            self.misses += 1
+            return await compute()
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            response = await compute()
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._pending[key]
+
+        if self._cacheable(response):
+            response = self._store(key, response, ttl)
+        # None tells the waiters to compute their own
+        future.set_result(response if self._shareable(response) else None)
+        return response
+
+    def _cacheable(self, response: HTTPResponse) -> bool:
+        return (
+            response.status == HTTPResponseCode.OK
+            and not isinstance(response, (FileResponse, StreamingResponse))
+            and "Set-Cookie" not in response.headers
+        )
+
+    def _shareable(self, response: HTTPResponse) -> bool:
+        """Whether several requests can send the same `response` object."""
+        return isinstance(response, (PreEncodedResponse, FileResponse))
+
+    def _store(self, key: tuple, response: HTTPResponse, ttl: float) -> PreEncodedResponse:
+        if not isinstance(response, PreEncodedResponse):
+            response = PreEncodedResponse(response)
+        entry = CachedResponse(response, time.monotonic() + ttl)
+        if entry.size > self.max_size:
+            return response
+
+        self._remove(key)
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_size and self.entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+        return response
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
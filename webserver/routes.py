@@ -2,68 +2,73 @@ import inspect
 import logging
 
 from webserver.enums import HTTPMethod
-from webserver.typedefs import AsyncFunction
+from webserver.typedefs import AsyncFunction, Executor
 from webserver.exceptions import MethodNotAllowed
+from webserver.binding import Binder
+from webserver.route_cache import CachePolicy
+
+logger = logging.getLogger(__name__)
 
 
 def split_path(path: str):
-    new_path = path.split("/")
-    for p in new_path:
-        if p == "":
-            new_path.remove(p)
-    return new_path
+    return [p for p in path.split("/") if p]
 
 
-# TODO: PathVarNode class for better/more efficient path variable handling
+def is_path_var(part: str):
+    return part.startswith("{") and part.endswith("}")
 
 
 class RouteNode:
+    """A registered route: the handler for one method on one path template."""
+
     def __init__(
-        self, path: str, method: HTTPMethod, handler: AsyncFunction | None = None
+        self,
+        path: str,
+        method: HTTPMethod,
+        handler: AsyncFunction | None = None,
+        executor: Executor | None = None,
+        cache: CachePolicy | None = None,
     ):
         self.path = path
         self.method = method
         self.handler = handler
+        self.executor = executor
+        self.cache = cache
+        if handler is not None:
+            is_async = inspect.iscoroutinefunction(handler)
+            if executor is None and not is_async:
+                # Plain functions would block the event loop
+                self.executor = "thread"
+            elif executor is not None and is_async:
+                raise ValueError(
+                    f"Handler for {method.value} {path} is async, executors only run regular functions"
+                )
+            if self.executor not in (None, "thread", "process"):
+                raise ValueError(f"Unknown executor {self.executor!r}")
         if handler is not None:
             self.handler_args = inspect.getfullargspec(handler).args
             self.handler_signature = inspect.signature(handler)
-        self.children = []
         self.path_vars: list[dict] = []
 
-        for part in split_path(path):
-            if part.startswith("{") and part.endswith("}"):
-                self.path_vars.append(
-                    {"name": part[1:-1], "pos": split_path(path).index(part)}
-                )
+        for pos, part in enumerate(split_path(path)):
+            if is_path_var(part):
+                self.path_vars.append({"name": part[1:-1], "pos": pos})
 
-        logging.debug(
-            f"Found path variables {self.path_vars} in route {self.method} {self.path}"
-        )
+        names = [var["name"] for var in self.path_vars]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate path variable in route {method.value} {path}")
 
-        logging.debug(
-            f"Registered route {self.method} {self.path} -> {self.handler} with args {self.handler_args}"
+        if handler is not None:
+            self.binder = Binder(handler, names)
+
+        logger.debug(
+            "Found path variables %s in route %s %s", self.path_vars, self.method, self.path
         )
 
-    def add_child(self, child):
-        for c in self.children:
-            c_path = split_path(c.path)
-            child_path = split_path(child.path)
-            if c_path[0] == child_path[0]:
-                logging.debug(f"Adding child {child} to existing child {c}")
-                c.add_child(child)
-                return
-
-        logging.debug(f"Adding child {child} to {self}")
-        self.children.append(child)
-
-    def get_child(self, path: str, method: HTTPMethod):
-        for child in self.children:
-            child_path = split_path(child.path)
-            path_parts = split_path(path)
-            if child_path == path_parts and child.method == method:
-                return child
-            elif child_path[0] == path_parts[0]:
-                return child.get_child(path, method)
+        logger.debug(
+            "Registered route %s %s -> %s with args %s",
+            self.method, self.path, self.handler, self.handler_args,
+        )
 
     def __str__(self):
         return f"RouteNode({self.path}, {self.method.value})"
@@ -72,77 +77,131 @@ class RouteNode:
         return self.__str__()
 
 
+class PathNode:
+    """
+    One path segment in the route trie.
+
+    Static segments are looked up in `children`, any other segment falls through
+    to the single `path_var` child. Routes ending at this segment are stored per
+    method in `routes`.
+    """
+
+    __slots__ = ("segment", "children", "path_var", "routes")
+
+    def __init__(self, segment: str = ""):
+        self.segment = segment
+        self.children: dict[str, PathNode] = {}
+        self.path_var: PathNode | None = None
+        self.routes: dict[HTTPMethod, RouteNode] = {}
+
+    def __str__(self):
+        return f"PathNode({self.segment}, {[m.value for m in self.routes]})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
 class RouteTree:
     def __init__(self):
-        self.roots: list[RouteNode] = []
-
-    def add_route(self, path: str, method: HTTPMethod, handler: AsyncFunction):
-        for root in self.roots:
-            root_path = split_path(root.path)
-            path_parts = split_path(path)
-            if root_path == path_parts and root.method == method:
-                raise ValueError(f"Route {method.value} {path} already exists")
-
-            # make sure route variables create a new root
-            path_vars = []
-            for part in path_parts:
-                if part.startswith("{") and part.endswith("}"):
-                    path_vars.append(part)
-            if path_vars:
-                logging.debug(
-                    f"Adding route {method.value} {path} with path variables {path_vars} to new root"
-                )
-                self.roots.append(RouteNode(path, method, handler))
-                return
+        self.root = PathNode()
+
+    def add_route(
+        self,
+        path: str,
+        method: HTTPMethod,
+        handler: AsyncFunction,
+        executor: Executor | None = None,
+        cache: CachePolicy | None = None,
+    ):
+        node = self.root
+        for part in split_path(path):
+            if is_path_var(part):
+                if node.path_var is None:
+                    node.path_var = PathNode("{}")
+                node = node.path_var
+            else:
+                if part not in node.children:
+                    node.children[part] = PathNode(part)
+                node = node.children[part]
+
+        if method in node.routes:
+            raise ValueError(f"Route {method.value} {path} already exists")
+
+        logger.debug("Adding route %s %s", method.value, path)
+        node.routes[method] = RouteNode(path, method, handler, executor, cache)
+        return node.routes[method]
+
+    def _find(self, node: PathNode, parts: list[str], i: int, values: list[str]):
+        # Static segments take precedence, path variables are only tried if the
+        # static branch doesn't lead to a route.
+        if i == len(parts):
+            return node if node.routes else None
+
+        child = node.children.get(parts[i])
+        if child is not None:
+            found = self._find(child, parts, i + 1, values)
+            if found is not None:
+                return found
+
+        if node.path_var is not None:
+            values.append(parts[i])
+            found = self._find(node.path_var, parts, i + 1, values)
+            if found is not None:
+                return found
+            values.pop()
 
-            if root_path[0] == path_parts[0]:
-                logging.debug(
-                    f"Adding route {method.value} {path} to existing root {root}"
-                )
-                root.add_child(RouteNode(path, method, handler))
-                return
+        return None
 
-        logging.debug(f"Adding route {method.value} {path} to new root")
-        self.roots.append(RouteNode(path, method, handler))
+    def match(
+        self, path: str, method: HTTPMethod
+    ) -> tuple[RouteNode, dict[str, str]] | None:
+        """
+        Find the route for `path` and `method`.
+
+        Returns the route and the captured path variables, or None if no route
+        matches the path. Raises MethodNotAllowed if the path matches but the
+        method doesn't.
+        """
+        values: list[str] = []
+        node = self._find(self.root, split_path(path), 0, values)
+        if node is None:
+            return None
+
+        route = node.routes.get(method)
+        if route is None:
+            raise MethodNotAllowed(
+                f"Method {method.value} not allowed for path {path}",
+                list(node.routes),
+            )
+
+        return route, {var["name"]: value for var, value in zip(route.path_vars, values)}
 
     def get_route(self, path: str, method: HTTPMethod) -> RouteNode | None:
-        method_mismatch = False
-
-        for root in self.roots:
-            root_path = split_path(root.path)
-            path_parts = split_path(path)
-            if root_path == path_parts and root.method == method:
-                return root
-            elif root_path[0] == path_parts[0]:
-                return root.get_child(path, method)
-
-            # Check path variables
-            for var in root.path_vars:
-                if var["pos"] < len(path_parts):
-                    root_path[var["pos"]] = path_parts[var["pos"]]
-                    if root_path == path_parts and root.method == method:
-                        logging.debug(f"Paths match with path variables: {root_path} == {path_parts}")
-                        logging.debug(f"Method matches: {root.method} == {method}")
-                        return root
-                    elif root.method != method:
-                        method_mismatch = True
-
-        if method_mismatch:
-            raise MethodNotAllowed(f"Method {method.value} not allowed for path {path}")
-
-        return None
+        match = self.match(path, method)
+        return match[0] if match is not None else None
+
+    def routes(self):
+        """Iterate over every registered route."""
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            yield from node.routes.values()
+            nodes.extend(node.children.values())
+            if node.path_var is not None:
+                nodes.append(node.path_var)
 
     def __str__(self):
-        return f"RouteTree({self.roots})"
+        return f"RouteTree({self.root})"
 
     def __repr__(self):
         return self.__str__()
 
     def print_tree(self):
-        for root in self.roots:
-            self._print_tree(root, 0)
+        self._print_tree(self.root, 0)
 
     def _print_tree(self, node, depth):
         print(" " * depth + str(node))
-        for child in node.children:
+        for child in node.children.values():
             self._print_tree(child, depth + 1)
+        if node.path_var is not None:
+            self._print_tree(node.path_var, depth + 1)
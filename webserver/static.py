@@ -0,0 +1,256 @@
+import os
+import time
+import mimetypes
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote
+
+from webserver.enums import (
+    HTTPRequest,
+    HTTPResponse,
+    HTTPResponseCode,
+    FileResponse,
+    PreEncodedResponse,
+)
+from webserver.compression import is_compressible_type
+
+
+def resolve_path(static_files_dir: str, request_path: str) -> str | None:
+    """
+    Map a request path to a file inside `static_files_dir`.
+
+    Returns None if there is no such file, raises PermissionError if the path
+    points outside of `static_files_dir`.
+    """
+    file_path = os.path.abspath(
+        os.path.join(static_files_dir, unquote(request_path).lstrip("/"))
+    )
+    if os.path.commonpath([static_files_dir, file_path]) != static_files_dir:
+        raise PermissionError(f"{request_path} is outside of the static files dir")
+
+    if not os.path.isfile(file_path):
+        return None
+    return file_path
+
+
+def content_type(file_path: str) -> str:
+    return mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+
+
+def parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None if the header should be ignored (malformed, other units or
+    multiple ranges), raises ValueError if the range can't be satisfied.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, sep, last = ranges.strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if (
+        not sep
+        or not (first or last)
+        or (first and not first.isdigit())
+        or (last and not last.isdigit())
+    ):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(f"Unsatisfiable range {range_header!r}")
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and start > end:
+        return None
+    if start >= size:
+        raise ValueError(f"Unsatisfiable range {range_header!r}")
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request: HTTPRequest, validators: list[str]) -> bool:
+    """Whether a Range header applies given the If-Range precondition (RFC 9110 13.1.5)."""
+    if_range = request.headers.get("If-Range")
+    return if_range is None or if_range.strip() in validators
+
+
+def file_headers(file_path: str, etag: str, last_modified: str) -> dict:
+    headers = {
+        "Content-Type": content_type(file_path),
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Accept-Ranges": "bytes",
+    }
+    if is_compressible_type(headers["Content-Type"]):
+        # The server may send a compressed variant to other clients
+        headers["Vary"] = "Accept-Encoding"
+    return headers
+
+
+def not_modified_headers(headers: dict) -> dict:
+    """The headers a 304 response repeats from the 200 response (RFC 9110 15.4.5)."""
+    return {key: headers[key] for key in ("ETag", "Last-Modified", "Vary") if key in headers}
+
+
+def make_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def is_not_modified(request: HTTPRequest, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (RFC 9110 13.1.2 and 13.1.3)."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, so W/"x" matches "x"
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+
+    return False
+
+
+def file_response(request: HTTPRequest, file_path: str) -> HTTPResponse:
+    """Build a response for `file_path`, honoring conditional and Range headers."""
+    stat = os.stat(file_path)
+    size = stat.st_size
+    etag = make_etag(stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = file_headers(file_path, etag, last_modified)
+
+    if is_not_modified(request, etag, stat.st_mtime):
+        return HTTPResponse("", not_modified_headers(headers), HTTPResponseCode.NOT_MODIFIED)
+
+    range_header = request.headers.get("Range")
+    if range_header is not None and if_range_matches(request, [etag, last_modified]):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return HTTPResponse(
+                "Range Not Satisfiable",
+                {"Content-Range": f"bytes */{size}"},
+                HTTPResponseCode.RANGE_NOT_SATISFIABLE,
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return FileResponse(
+                file_path, start, end - start + 1, headers, HTTPResponseCode.PARTIAL_CONTENT
+            )
+
+    return FileResponse(file_path, 0, size, headers)
+
+
+class CachedFile:
+    __slots__ = ("file_path", "mtime", "mtime_ns", "size", "etag", "checked_at", "ok", "not_modified")
+
+    def __init__(self, file_path: str, stat: os.stat_result, data: bytes):
+        self.file_path = file_path
+        self.mtime = stat.st_mtime
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.etag = make_etag(stat)
+        self.checked_at = time.monotonic()
+
+        headers = file_headers(
+            file_path, self.etag, formatdate(stat.st_mtime, usegmt=True)
+        )
+        self.ok = PreEncodedResponse(HTTPResponse(data, headers), file_path)
+        self.not_modified = PreEncodedResponse(
+            HTTPResponse(b"", not_modified_headers(headers), HTTPResponseCode.NOT_MODIFIED)
+        )
+
+    @property
+    def memory_size(self) -> int:
+        return len(self.ok.head) + len(self.ok.body) + len(self.not_modified.head)
+
+
+class StaticFileCache:
+    """
+    LRU cache of small static files, kept as pre-encoded responses.
+
+    Entries are keyed on the request path, so a hit skips path resolution and
+    disk access entirely. Entries are re-validated against the file's mtime and
+    size at most once every `revalidate_interval` seconds, and the least
+    recently used entries are evicted once the cache holds more than
+    `max_size` bytes. Range requests are always served from disk.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_file_size: int = 1024 * 256,  # 256 KB
+        revalidate_interval: float = 1.0,  # seconds
+    ):
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+        self.revalidate_interval = revalidate_interval
+        self.entries: OrderedDict[str, CachedFile] = OrderedDict()
+        self.size = 0
+
+    def _respond(self, entry: CachedFile, request: HTTPRequest) -> HTTPResponse:
+        if is_not_modified(request, entry.etag, entry.mtime):
+            return entry.not_modified
+        return entry.ok
+
+    def lookup(self, request: HTTPRequest) -> HTTPResponse | None:
+        """Return the cached response for `request`, or None on a miss."""
+        entry = self.entries.get(request.path)
+        if entry is None or "Range" in request.headers:
+            return None
+
+        now = time.monotonic()
+        if now - entry.checked_at >= self.revalidate_interval:
+            try:
+                stat = os.stat(entry.file_path)
+            except OSError:
+                stat = None
+            if stat is None or (stat.st_mtime_ns, stat.st_size) != (entry.mtime_ns, entry.size):
+                self.evict(request.path)
+                return None
+            entry.checked_at = now
+
+        self.entries.move_to_end(request.path)
+        return self._respond(entry, request)
+
+    def load(self, request: HTTPRequest, file_path: str) -> HTTPResponse:
+        """Respond to `request` from `file_path`, caching the file if it is small enough."""
+        if "Range" in request.headers:
+            return file_response(request, file_path)
+
+        with open(file_path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            if stat.st_size > min(self.max_file_size, self.max_size):
+                return file_response(request, file_path)
+            data = file.read()
+
+        if len(data) != stat.st_size:
+            # Modified while reading, serve it from disk until it settles
+            return file_response(request, file_path)
+
+        entry = CachedFile(file_path, stat, data)
+        self.evict(request.path)
+        self.entries[request.path] = entry
+        self.size += entry.memory_size
+        while self.size > self.max_size and self.entries:
+            self.evict(next(iter(self.entries)))
+
+        return self._respond(entry, request)
+
+    def evict(self, path: str):
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.size -= entry.memory_size
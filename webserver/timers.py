@@ -0,0 +1,86 @@
+import asyncio
+import math
+import time
+from collections.abc import Callable
+
+
+class Timer:
+    """A deadline in a TimerWheel. Reusable: schedule it again for the next deadline."""
+
+    __slots__ = ("callback", "tick")
+
+    def __init__(self, callback: Callable[[], None]):
+        self.callback = callback
+        self.tick: int | None = None
+
+    @property
+    def scheduled(self) -> bool:
+        return self.tick is not None
+
+
+class TimerWheel:
+    """
+    Coarse timers for many connections at once.
+
+    Deadlines are rounded up to the next multiple of `resolution` seconds and
+    kept in one bucket per tick. A single task wakes up once per tick and
+    fires the timers in the buckets that are due, so scheduling, moving or
+    cancelling a timer is a set insertion or removal, and ten thousand idle
+    connections cost no more wake-ups than one. Timers fire up to
+    `resolution` seconds late.
+    """
+
+    def __init__(self, resolution: float = 0.25):
+        self.resolution = resolution
+        self.buckets: dict[int, set[Timer]] = {}
+        # The last tick whose timers have fired
+        self._current_tick = math.floor(time.monotonic() / resolution)
+        self._task: asyncio.Task | None = None
+
+    def schedule(self, timer: Timer, delay: float):
+        """Fire `timer` in `delay` seconds, replacing its current deadline."""
+        self.cancel(timer)
+        # Never in a tick that was already processed
+        tick = max(
+            math.ceil((time.monotonic() + delay) / self.resolution), self._current_tick + 1
+        )
+        bucket = self.buckets.get(tick)
+        if bucket is None:
+            bucket = self.buckets[tick] = set()
+        bucket.add(timer)
+        timer.tick = tick
+
+    def cancel(self, timer: Timer):
+        if timer.tick is None:
+            return
+        bucket = self.buckets.get(timer.tick)
+        if bucket is not None:
+            bucket.discard(timer)
+            if not bucket:
+                del self.buckets[timer.tick]
+        timer.tick = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.resolution)
+            self.advance(time.monotonic())
+
+    def advance(self, now: float):
+        """Fire every timer due by `now`."""
+        target = math.floor(now / self.resolution)
+        while self._current_tick < target:
+            self._current_tick += 1
+            bucket = self.buckets.pop(self._current_tick, None)
+            if not bucket:
+                continue
+            for timer in bucket:
+                timer.tick = None
+                timer.callback()
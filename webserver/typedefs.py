@@ -1,5 +1,7 @@
-from typing import Awaitable, Callable, TypeVar, Union, ParamSpec
+from typing import Awaitable, Callable, Literal, TypeVar, Union, ParamSpec
 
 T = TypeVar("T")
 P = ParamSpec("P")
-AsyncFunction = Union[Callable[P, Awaitable[T]], Callable]
\ No newline at end of file
+AsyncFunction = Union[Callable[P, Awaitable[T]], Callable]
+Executor = Literal["thread", "process"]
+Engine = Literal["streams", "protocol"]
@@ -0,0 +1,117 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+from collections.abc import Callable, Iterable
+
+from webserver.connection import Connection
+
+logger = logging.getLogger(__name__)
+
+
+class Watchdog:
+    """
+    Reports event loop stalls and slow handlers.
+
+    With `stall_threshold` set, a background thread pings the event loop every
+    `stall_threshold / 4` seconds. When the loop hasn't answered for longer
+    than the threshold, the thread logs the loop thread's current stack and
+    the request being handled, and counts the stall against that request's
+    route. Handlers that take longer than `slow_handler_threshold` are logged
+    and counted per route as well.
+    """
+
+    def __init__(
+        self,
+        stall_threshold: float | None = None,  # seconds
+        slow_handler_threshold: float | None = None,  # seconds
+    ):
+        self.stall_threshold = stall_threshold
+        self.slow_handler_threshold = slow_handler_threshold
+        self.stalls: Counter[str] = Counter()
+        self.slow_handlers: Counter[str] = Counter()
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._connections: Callable[[], Iterable[Connection]] = tuple
+        self._last_tick = 0.0
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self, connections: Callable[[], Iterable[Connection]]):
+        """Start watching the running event loop. `connections` lists the open connections."""
+        if self.stall_threshold is None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._connections = connections
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="webserver-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _tick(self):
+        self._last_tick = time.monotonic()
+
+    def _watch(self):
+        interval = max(self.stall_threshold / 4, 0.005)
+        stalled_since = None
+        while not self._stopped.wait(interval):
+            try:
+                self._loop.call_soon_threadsafe(self._tick)
+            except RuntimeError:
+                # The loop was closed
+                return
+
+            now = time.monotonic()
+            if now - self._last_tick <= self.stall_threshold:
+                if stalled_since is not None:
+                    logger.warning(
+                        "Event loop was blocked for %.3fs", self._last_tick - stalled_since
+                    )
+                    stalled_since = None
+            elif stalled_since is None:
+                stalled_since = self._last_tick
+                self._report_stall(now - self._last_tick)
+
+    def _report_stall(self, blocked_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+
+        request = None
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            for connection in list(self._connections()):
+                if connection.task is task:
+                    request = connection.request
+                    break
+
+        if request is not None:
+            self.stalls[request.route or ""] += 1
+            logger.warning(
+                "Event loop blocked for %.3fs handling %s %s (route %s), stack:\n%s",
+                blocked_for, request.method.value, request.path, request.route, stack,
+            )
+        else:
+            self.stalls[""] += 1
+            logger.warning("Event loop blocked for %.3fs, stack:\n%s", blocked_for, stack)
+
+    def handler_finished(self, request, duration: float):
+        """Report `request` if its handler took longer than the budget."""
+        if self.slow_handler_threshold is not None and duration > self.slow_handler_threshold:
+            self.slow_handlers[request.route or ""] += 1
+            logger.warning(
+                "Slow handler for %s %s (route %s) took %.3fs",
+                request.method.value, request.path, request.route, duration,
+            )
@@ -1,12 +1,17 @@
 from dataclasses import dataclass
 import logging
-import datetime
-import traceback
 import asyncio
+import contextlib
+import functools
 import os
+import signal
+import socket
+import time
 from typing import Optional
+from collections.abc import AsyncIterable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from webserver.routes import RouteTree, split_path
+from webserver.routes import RouteTree, RouteNode
 from webserver.enums import (
     HTTPMethod,
     HTTPResponseCode,
@@ -14,24 +19,39 @@ from webserver.enums import (
     HTTPError,
     HTTPVersion,
     HTTPRequest,
+    FileResponse,
+    StreamingResponse,
+    BODYLESS_STATUSES,
 )
-from webserver.typedefs import AsyncFunction
-from webserver.log_formatter import LogFormatter, LogFileFormatter
-from webserver.exceptions import MethodNotAllowed
+from webserver import static, pyhtml
+from webserver.compression import Compressor, negotiate
+from webserver.route_cache import CachePolicy, RouteCache
+from webserver.admission import AdmissionController
+from webserver.watchdog import Watchdog
+from webserver.profiling import Profiler
+from webserver.timers import TimerWheel
+from webserver.workers import Supervisor
+from webserver.typedefs import AsyncFunction, Engine, Executor
+from webserver import logs
+from webserver.metrics import Metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from webserver.exceptions import (
+    MethodNotAllowed,
+    MalformedRequest,
+    HeadersTooLarge,
+    PayloadTooLarge,
+    UnsupportedTransferEncoding,
+    Overloaded,
+)
+from webserver.parser import RequestParser
+from webserver.connection import Connection
+from webserver.protocol import HTTPProtocol
 from webserver.error_handlers import BaseErrorHandler, DefaultErrorHandler
 
-logFormatter = LogFormatter()
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
-
-consoleHandler = logging.StreamHandler()
-consoleHandler.setFormatter(logFormatter)
-logger.addHandler(consoleHandler)
+logger = logging.getLogger(__name__)
+access_logger = logs.access_logger
 
-logFileFormatter = LogFileFormatter()
-fileHandler = logging.FileHandler("webserver.log")
-fileHandler.setFormatter(logFileFormatter)
-logger.addHandler(fileHandler)
+READ_CHUNK_SIZE = 1024 * 64  # 64 KB
+SENDFILE_CHUNK_SIZE = 1024 * 1024  # 1 MB
 
 
 class Webserver:
@@ -41,224 +61,818 @@ class Webserver:
         port,
         static_files_dir: Optional[str] = None,
         error_handler: Optional[BaseErrorHandler] = DefaultErrorHandler(),
+        keep_alive_timeout: float = 5.0,
+        header_timeout: float = 10.0,  # seconds to receive the request head
+        body_timeout: float = 30.0,  # seconds without receiving any of the body
+        handler_timeout: Optional[float] = None,  # seconds
+        timer_resolution: float = 0.25,  # seconds
+        max_keep_alive_requests: int = 100,
+        max_header_size: int = 1024 * 64,  # 64 KB
+        max_body_size: int = 1024 * 1024 * 30,  # 30 MB
+        static_cache_size: int = 0,  # bytes, 0 disables the static file cache
+        compressor: Optional[Compressor] = None,
+        workers: int = 1,
+        reuse_port: bool = False,
+        thread_pool_size: Optional[int] = None,
+        process_pool_size: Optional[int] = None,
+        write_buffer_high: int = 1024 * 64,  # 64 KB
+        write_buffer_low: int = 1024 * 16,  # 16 KB
+        send_timeout: float = 30.0,  # seconds
+        log_level: int = logging.INFO,
+        access_log: bool = True,
+        log_file: Optional[str] = "webserver.log",
+        metrics_path: Optional[str] = None,
+        route_cache_size: int = 1024 * 1024 * 32,  # 32 MB
+        max_connections: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        max_loop_lag: Optional[float] = None,  # seconds
+        priority_paths: Iterable[str] = (),
+        retry_after: int = 1,  # seconds
+        stall_threshold: Optional[float] = None,  # seconds
+        slow_handler_threshold: Optional[float] = None,  # seconds
+        profiler: Optional[Profiler] = None,
+        profile_path: Optional[str] = None,
+        engine: Engine = "streams",
+        shutdown_timeout: float = 10.0,  # seconds
     ):
         self.host = host
         self.port = port
-        self.timeout = 1.2  # seconds
+        if engine not in ("streams", "protocol"):
+            raise ValueError(f"Unknown engine {engine!r}")
+        # "streams" serves each connection from a task reading a StreamReader,
+        # "protocol" parses in HTTPProtocol.data_received without one
+        self.engine = engine
+        self.keep_alive_timeout = keep_alive_timeout  # seconds
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+        self.handler_timeout = handler_timeout
+        # Deadlines of every connection, see TimerWheel
+        self.timers = TimerWheel(timer_resolution)
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
         self.route_tree: RouteTree = RouteTree()
         self.static_files_dir: Optional[str] = static_files_dir
+        self.static_cache: Optional[static.StaticFileCache] = None
+        if static_cache_size > 0:
+            self.static_cache = static.StaticFileCache(static_cache_size)
+        self.compressor: Optional[Compressor] = compressor
+        self.workers = workers
+        self.reuse_port = reuse_port
+        # Pools for handlers registered with executor="thread" or "process"
+        self.thread_pool_size = thread_pool_size
+        self.process_pool_size = process_pool_size
+        self.thread_pool: Optional[ThreadPoolExecutor] = None
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+        self.write_buffer_high = write_buffer_high
+        self.write_buffer_low = write_buffer_low
+        self.send_timeout = send_timeout
+        self.connections: set[Connection] = set()
+        # On SIGTERM the server stops accepting and waits up to
+        # `shutdown_timeout` for open connections to finish their requests
+        self.shutdown_timeout = shutdown_timeout
+        self.stopping = False
+        # Responses of routes registered with cache_ttl
+        self.route_cache = RouteCache(route_cache_size)
+        self.metrics = Metrics()
+        self.metrics.route_cache = self.route_cache
+        # Load shedding, see AdmissionController
+        self.admission = AdmissionController(
+            max_connections, max_in_flight, max_loop_lag, priority_paths, retry_after
+        )
+        self.metrics.admission = self.admission
+        self.watchdog = Watchdog(stall_threshold, slow_handler_threshold)
+        self.metrics.watchdog = self.watchdog
+        self.profiler: Optional[Profiler] = profiler
+        if profile_path is not None:
+            if profiler is None:
+                raise ValueError("profile_path needs a profiler")
+            self._register_route(profile_path, HTTPMethod.GET, self._profile_endpoint)
+        if metrics_path is not None:
+            self._register_route(metrics_path, HTTPMethod.GET, self._metrics_endpoint)
+        # Logs are written by a background thread, see webserver.logs
+        logs.configure(log_level, access_log=access_log, log_file=log_file)
 
         if not isinstance(error_handler, BaseErrorHandler):
             raise TypeError("error_handler must be an instance of BaseErrorHandler")
 
         self.error_handler: BaseErrorHandler = error_handler
 
-    def _send(self, writer, response: HTTPResponse):
-        writer.write(response.to_string().encode())
-        writer.close()
+    async def _send(
+        self,
+        writer,
+        response: HTTPResponse,
+        keep_alive: bool = False,
+        head_only: bool = False,
+    ):
+        if response.status in BODYLESS_STATUSES:
+            head_only = True
+        if isinstance(response, FileResponse) and not head_only:
+            await self._send_file(writer, response, keep_alive)
+            return
+        if isinstance(response, StreamingResponse) and not head_only:
+            await self._send_stream(writer, response, keep_alive)
+            return
+
+        chunks = response.encode(keep_alive)
+        # Responses to HEAD requests have the same headers but no body
+        if head_only:
+            chunks = chunks[:2]
+        writer.writelines(chunks)
+        self.metrics.bytes_sent += sum(map(len, chunks))
+        await self._drain(writer)
+
+    async def _drain(self, writer: asyncio.StreamWriter):
+        """
+        Wait until the transport's write buffer is below the low water mark.
+        Clients that don't read anything for `send_timeout` seconds are
+        disconnected, so slow readers can't pile up buffered responses.
+        """
+        transport = writer.transport
+        if not transport.get_write_buffer_size() and not transport.is_closing():
+            # The socket took everything already, nothing to wait for
+            return
+        while True:
+            buffered = transport.get_write_buffer_size()
+            try:
+                async with asyncio.timeout(self.send_timeout):
+                    await writer.drain()
+                return
+            except TimeoutError:
+                if transport.get_write_buffer_size() < buffered:
+                    # Slow, but still reading
+                    continue
+                peer = writer.get_extra_info("peername")
+                logger.warning(
+                    "Aborting connection to %s, no progress sending %d buffered bytes", peer, buffered
+                )
+                transport.abort()
+                raise ConnectionAbortedError(f"Client {peer} stopped reading")
+
+    async def _send_file(self, writer, response: FileResponse, keep_alive: bool):
+        try:
+            file = open(response.path, "rb")
+        except OSError:
+            logger.warning("Static file %s disappeared before sending", response.path)
+            await self._send(writer, HTTPError.NOT_FOUND, keep_alive)
+            return
+
+        with file:
+            chunks = response.encode(keep_alive)
+            writer.writelines(chunks)
+            self.metrics.bytes_sent += sum(map(len, chunks))
+            await self._drain(writer)
+
+            # Uses os.sendfile where the transport supports it, and falls back
+            # to reading and writing chunks otherwise. Sending in slices lets a
+            # client that stops reading be caught by send_timeout.
+            loop = asyncio.get_running_loop()
+            offset, remaining = response.offset, response.count
+            while remaining > 0:
+                count = min(remaining, SENDFILE_CHUNK_SIZE)
+                try:
+                    async with asyncio.timeout(self.send_timeout):
+                        sent = await loop.sendfile(writer.transport, file, offset, count)
+                except TimeoutError:
+                    peer = writer.get_extra_info("peername")
+                    logger.warning("Aborting connection to %s, sending %s stalled", peer, response.path)
+                    writer.transport.abort()
+                    raise ConnectionAbortedError(f"Client {peer} stopped reading")
+                if sent < count:
+                    # The file shrank after the headers went out, the client can't
+                    # tell where this response ends so the connection has to go.
+                    raise ConnectionAbortedError(f"Short sendfile for {response.path}")
+                offset += sent
+                remaining -= sent
+                self.metrics.bytes_sent += sent
+
+    async def _send_stream(
+        self, writer: asyncio.StreamWriter, response: StreamingResponse, keep_alive: bool
+    ):
+        chunks = response.encode(keep_alive)
+        writer.writelines(chunks)
+        self.metrics.bytes_sent += sum(map(len, chunks))
+        await self._drain(writer)
+
+        try:
+            async with contextlib.aclosing(response.chunks()) as chunks:
+                async for chunk in chunks:
+                    if not chunk:
+                        # An empty chunk would end a chunked body
+                        continue
+                    if response.chunked:
+                        size = b"%x\r\n" % len(chunk)
+                        writer.writelines([size, chunk, b"\r\n"])
+                        self.metrics.bytes_sent += len(size) + len(chunk) + 2
+                    else:
+                        writer.write(chunk)
+                        self.metrics.bytes_sent += len(chunk)
+                    await self._drain(writer)
+        except ConnectionError:
+            raise
+        except Exception:
+            # The status line is already out, all we can do is cut the
+            # connection so the client doesn't take a truncated body as complete.
+            logger.exception("Error streaming response")
+            writer.transport.abort()
+            raise ConnectionAbortedError("Streaming response failed")
+
+        if response.chunked:
+            writer.write(b"0\r\n\r\n")
+            self.metrics.bytes_sent += 5
+            await self._drain(writer)
+
+    def write_buffer_sizes(self) -> list[tuple[tuple, int]]:
+        """Buffered outgoing bytes per open connection, slowest clients first."""
+        sizes = [(c.client_address, c.write_buffer_size) for c in self.connections]
+        return sorted(sizes, key=lambda item: item[1], reverse=True)
+
+    def _keep_alive(self, request: HTTPRequest) -> bool:
+        """Whether the connection should stay open after responding to `request`."""
+        if self.stopping:
+            return False
+        connection = request.headers.get("Connection", "").lower()
+        tokens = [token.strip() for token in connection.split(",")]
+        if "close" in tokens:
+            return False
+        if "keep-alive" in tokens:
+            return True
+        return request.http_version == HTTPVersion.HTTP_1_1
 
     def start(self):
         if self.static_files_dir is not None:
             self.static_files_dir = os.path.abspath(self.static_files_dir)
 
         self.running = True
-        asyncio.run(self._run())
+        try:
+            if self.workers > 1:
+                # A second more than the workers take to drain before killing them
+                Supervisor(
+                    self, self.workers, self.reuse_port, self.shutdown_timeout + 1.0
+                ).run()
+            else:
+                asyncio.run(self._run(reuse_port=self.reuse_port))
+        finally:
+            logs.stop()
+
+    async def _run(self, sock: Optional[socket.socket] = None, reuse_port: bool = False):
+        self._start_executors()
+        lag_probe = None
+        if self.admission.max_loop_lag is not None:
+            lag_probe = asyncio.create_task(self.admission.probe_loop_lag())
+        self.watchdog.start(lambda: self.connections)
+        self.timers.start()
+        if self.profiler is not None:
+            self.profiler.start()
+        if self.engine == "protocol":
+            serve = functools.partial(
+                asyncio.get_running_loop().create_server, functools.partial(HTTPProtocol, self)
+            )
+        else:
+            serve = functools.partial(asyncio.start_server, self._recv)
+        if sock is not None:
+            self.server = await serve(sock=sock)
+        else:
+            self.server = await serve(self.host, self.port, reuse_port=reuse_port or None)
+        logger.info("Server started on %s:%s (pid %d)", self.host, self.port, os.getpid())
 
-    async def _run(self):
-        self.server = await asyncio.start_server(self._recv, self.host, self.port)
-        logging.info(f"Server started on {self.host}:{self.port}")
+        stop = asyncio.Event()
+        try:
+            # Drain and stop on SIGTERM, e.g. when the supervisor shuts down
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on Windows, or not running in the main thread
+            pass
 
         try:
-            async with self.server:
-                await self.server.serve_forever()
+            await self.server.start_serving()
+            await stop.wait()
+            logger.info("Shutting down server")
+            self.stopping = True
+            self.server.close()
+            await self._close_connections(self.shutdown_timeout)
         except (KeyboardInterrupt, asyncio.CancelledError):
-            logging.info("Shutting down server")
+            logger.info("Shutting down server")
         except Exception:
-            logging.error(f"Error running server:\n{traceback.format_exc().strip()}")
+            logger.exception("Error running server")
         finally:
+            self.stopping = True
+            if lag_probe is not None:
+                lag_probe.cancel()
+            self.watchdog.stop()
+            self.timers.stop()
+            if self.profiler is not None and self.profiler.output_dir is not None:
+                self.profiler.dump()
             self.server.close()
+            for connection in list(self.connections):
+                connection.transport.abort()
             await self.server.wait_closed()
+            self._shutdown_executors()
+
+    async def _close_connections(self, timeout: float):
+        """
+        Wait up to `timeout` seconds for the open connections to finish their
+        requests. Connections waiting for their next request are closed, the
+        others close after their response since `stopping` disables keep-alive.
+        """
+        deadline = time.monotonic() + timeout
+        while self.connections:
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    "Closing %d connections that did not finish in time", len(self.connections)
+                )
+                return
+            for connection in list(self.connections):
+                if connection.request is None and connection.phase == "idle":
+                    connection.transport.close()
+            await asyncio.sleep(0.1)
 
     async def _recv(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
-        client_address = writer.get_extra_info("peername")
-        MAX_REQUEST_SIZE = 1024 * 1024 * 30  # 30 MB
-        try:
-            async with asyncio.timeout(self.timeout):
-                _request = (await reader.read(MAX_REQUEST_SIZE)).decode()
-        except asyncio.TimeoutError:
-            logging.error(f"Timed out receiving request from {client_address}")
-            self._send(writer, HTTPError.REQUEST_TIMEOUT)
+        if not self.admission.accept_connection(len(self.connections)):
+            await self._reject(reader, writer)
             return
 
+        connection = Connection(reader, writer)
+        client_address = connection.client_address
+        parser = RequestParser(self.max_header_size, self.max_body_size, self._admit_head)
+        self.connections.add(connection)
+        self.metrics.open_connections += 1
+        self.metrics.connections_total += 1
+        writer.transport.set_write_buffer_limits(
+            self.write_buffer_high, self.write_buffer_low
+        )
+
         try:
-            request = HTTPRequest.from_string(_request, client_address)
-        except Exception:
-            logging.warning(f"Bad request from {client_address}")
-            logging.debug(f"Error parsing request:\n{traceback.format_exc().strip()}")
-            try:
-                self._send(writer, HTTPError.BAD_REQUEST)
-            except Exception:
-                logging.info(
-                    f"Error sending response:\n{traceback.format_exc().strip()}"
+            while True:
+                try:
+                    message = await self._read_request(connection, parser)
+                except asyncio.CancelledError:
+                    if not self._timed_out(connection):
+                        raise
+                    if connection.phase != "idle":
+                        logger.warning(
+                            "Timed out receiving request %s from %s",
+                            connection.phase, client_address,
+                        )
+                        await self._send(writer, HTTPError.REQUEST_TIMEOUT)
+                    break
+                except (HeadersTooLarge, PayloadTooLarge, MalformedRequest) as e:
+                    await self._send(writer, self._parse_error(e, client_address))
+                    break
+                except Overloaded:
+                    logger.warning("Overloaded, rejecting request from %s", client_address)
+                    await self._reject(reader, writer)
+                    break
+
+                if message is None:
+                    # Client closed the connection
+                    break
+
+                request = self._admit(connection, message)
+                if isinstance(request, HTTPResponse):
+                    await self._send(writer, request)
+                    break
+                keep_alive = (
+                    self._keep_alive(request)
+                    and connection.requests_served < self.max_keep_alive_requests
                 )
-            return
 
-        request_response_code = HTTPResponseCode.OK
+                self.metrics.in_flight += 1
+                connection.request = request
+                started = time.perf_counter()
+                try:
+                    response, keep_alive = await self._respond(connection, request, keep_alive)
+                    await self._send(
+                        writer, response, keep_alive, request.method == HTTPMethod.HEAD
+                    )
+                finally:
+                    self.metrics.in_flight -= 1
+                    connection.request = None
+                self._log_request(request, response, started)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            logger.debug("Connection to %s lost", client_address)
+        except asyncio.CancelledError:
+            if not self.stopping:
+                raise
+            # Cancelled by asyncio.run after the server stopped
+            logger.debug("Connection to %s closed at shutdown", client_address)
+        finally:
+            self.timers.cancel(connection.timer)
+            self.connections.discard(connection)
+            self.metrics.open_connections -= 1
+            writer.close()
+
+    def _parse_error(self, error: Exception, client_address) -> HTTPResponse:
+        """Log a request the parser rejected with `error`, returns the response for it."""
+        if isinstance(error, HeadersTooLarge):
+            logger.warning("Request headers too large from %s", client_address)
+            return HTTPError.REQUEST_HEADER_FIELDS_TOO_LARGE
+        if isinstance(error, PayloadTooLarge):
+            logger.warning("Request body too large from %s", client_address)
+            return HTTPError.PAYLOAD_TOO_LARGE
+        if isinstance(error, UnsupportedTransferEncoding):
+            logger.warning("Unsupported transfer coding from %s", client_address)
+            return HTTPError.NOT_IMPLEMENTED
+        logger.warning("Bad request from %s", client_address)
+        logger.debug("Error parsing request", exc_info=error)
+        return HTTPError.BAD_REQUEST
+
+    def _admit_head(self, head: bytes):
+        """
+        Parser callback, refuses a request as soon as its head is in, so a
+        large body isn't read only to be answered with a 503.
+        """
+        if not self.admission.accept_request(head, self.metrics.in_flight):
+            raise Overloaded("Request refused by admission control")
+
+    def _admit(
+        self, connection: Connection, message: tuple[bytes, bytes]
+    ) -> HTTPRequest | HTTPResponse:
+        """The request for a parsed `message`, or the response refusing it."""
+        client_address = connection.client_address
+        try:
+            request = HTTPRequest.from_bytes(*message, client_address)
+        except Exception as e:
+            return self._parse_error(e, client_address)
+
+        connection.requests_served += 1
+        return request
+
+    async def _respond(
+        self, connection: Connection, request: HTTPRequest, keep_alive: bool
+    ) -> tuple[HTTPResponse, bool]:
+        """The response to send for `request`, and whether to keep the connection after it."""
+        started = time.perf_counter()
+        response = await self._run_handler(connection, request)
+        self.watchdog.handler_finished(request, time.perf_counter() - started)
+        if self.compressor is not None:
+            response = await self.compressor.apply(request, response)
+        if isinstance(response, StreamingResponse) and request.http_version == HTTPVersion.HTTP_1_0:
+            # No chunked encoding in HTTP/1.0, closing the connection marks
+            # the end of the body instead.
+            response.chunked = False
+            keep_alive = False
+        return response, keep_alive
+
+    def _log_request(self, request: HTTPRequest, response: HTTPResponse, started: float):
+        self.metrics.observe(
+            request.route or "",
+            request.method.value,
+            response.status.value.code,
+            time.perf_counter() - started,
+        )
+        access_logger.info(
+            "%s %s %s %s",
+            request.client_address[0],
+            request.method.value,
+            request.path,
+            response.status.value,
+        )
+
+    def _timed_out(self, connection: Connection) -> bool:
+        """Whether a CancelledError came from the connection's deadline expiring."""
+        if not connection.timed_out:
+            return False
+        connection.timed_out = False
+        # Anything else that cancelled the task still has to go through
+        return asyncio.current_task().uncancel() == 0
+
+    async def _run_handler(self, connection: Connection, request: HTTPRequest) -> HTTPResponse:
+        if self.handler_timeout is not None:
+            connection.phase = "handler"
+            self.timers.schedule(connection.timer, self.handler_timeout)
+        try:
+            if self.profiler is not None and self.profiler.should_profile(request):
+                return await self.profiler.run(request, self._handle(request))
+            return await self._handle(request)
+        except asyncio.CancelledError:
+            if not self._timed_out(connection):
+                raise
+            logger.warning(
+                "Handler for %s %s timed out after %.1fs",
+                request.method.value, request.path, self.handler_timeout,
+            )
+            return HTTPError.SERVICE_UNAVAILABLE
+        finally:
+            self.timers.cancel(connection.timer)
 
+    async def _reject(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer with a 503 and close, without reading the rest of the request."""
         try:
-            route = self.route_tree.get_route(request.path, request.method)
-        except MethodNotAllowed:
-            self._send(writer, HTTPError.METHOD_NOT_ALLOWED)
-            return
+            await self._send(writer, self.admission.response)
+            # Closing with the request still unread would reset the connection,
+            # which can destroy the response before the client reads it. Wait
+            # briefly for the client to close first, discarding what it sent.
+            writer.write_eof()
+            async with asyncio.timeout(1.0):
+                while await reader.read(READ_CHUNK_SIZE):
+                    pass
+        except (ConnectionError, TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(
+        self, connection: Connection, parser: RequestParser
+    ) -> tuple[bytes, bytes] | None:
+        """
+        Read from the connection until `parser` has a complete request, or None
+        on EOF. Each phase has its own deadline: the wait for the next request
+        on an idle keep-alive connection, the whole request head (counted from
+        the connection opening for the first request), and gaps between reads
+        of the body.
+        """
+        message = parser.next_request()
+        if message is not None:
+            # Pipelined, already buffered
+            return message
+
+        timers = self.timers
+        if parser.idle and connection.requests_served > 0:
+            connection.phase = "idle"
+            timers.schedule(connection.timer, self.keep_alive_timeout)
+        else:
+            connection.phase = "header"
+            timers.schedule(connection.timer, self.header_timeout)
 
-        if route is None and self.static_files_dir:
-            file_path = os.path.join(self.static_files_dir, request.path[1:])
-            file_path = os.path.abspath(file_path)
-            logging.debug(f"Checking for static file {file_path}")
-            logging.debug(f"Static files dir: {self.static_files_dir}")
-
-            if (
-                not os.path.commonprefix([self.static_files_dir, file_path])
-                == self.static_files_dir
-            ):
-                self._send(writer, HTTPError.FORBIDDEN)
-                return
+        try:
+            while message is None:
+                if parser.reading_body:
+                    connection.phase = "body"
+                    timers.schedule(connection.timer, self.body_timeout)
+                elif connection.phase == "idle" and not parser.idle:
+                    connection.phase = "header"
+                    timers.schedule(connection.timer, self.header_timeout)
+
+                data = await connection.reader.read(READ_CHUNK_SIZE)
+                if not data:
+                    if not parser.idle:
+                        raise MalformedRequest("Connection closed mid-request")
+                    return None
+                self.metrics.bytes_received += len(data)
+                parser.feed(data)
+                message = parser.next_request()
+        finally:
+            timers.cancel(connection.timer)
+        return message
 
-            if os.path.exists(file_path):
-                # deepcode ignore PT: the code above prevents path traversal
-                with open(file_path, "r") as file:
-                    self._send(writer, HTTPResponse(file.read()))
-                return
-        if route is not None:
-            path_vars = []
-            for var in route.path_vars:
-                path_vars.append(var["name"])
-            handler_args = []
-            for arg in route.handler_args:
-                if (
-                    arg == "request"
-                    or route.handler_signature.parameters[arg].annotation == HTTPRequest
-                ):
-                    handler_args.append(request)
-                elif arg in path_vars:
-                    # value = split_path(request.path)[var["pos"]]
-                    value = split_path(request.path)[path_vars.index(arg)]
-                    param_type = route.handler_signature.parameters[arg].annotation
-                    try:
-                        handler_args.append(param_type(value))
-                    except ValueError:
-                        self._send(writer, HTTPError.BAD_REQUEST)
-                        return
-                    logging.debug(f"Found path variable {arg} with value {value}")
-                else:
-                    if request.query_params is not None:
-                        if arg in request.query_params.keys():
-                            value = request.query_params[arg]
-                            param_type = route.handler_signature.parameters[
-                                arg
-                            ].annotation
-                            try:
-                                handler_args.append(param_type(value))
-                            except ValueError:
-                                self._send(writer, HTTPError.BAD_REQUEST)
-                                return
+    async def _handle(self, request: HTTPRequest) -> HTTPResponse:
+        try:
+            match = self.route_tree.match(request.path, request.method)
+        except MethodNotAllowed as e:
+            allowed = ", ".join(method.value for method in e.allowed)
+            return HTTPResponse(
+                "Method Not Allowed",
+                {"Allow": allowed},
+                HTTPResponseCode.METHOD_NOT_ALLOWED,
+            )
+
+        route, path_vars = match if match is not None else (None, {})
+
+        if route is None and self.static_files_dir:
+            if self.static_cache is not None:
+                response = self.static_cache.lookup(request)
+                if response is not None:
+                    return response
 
             try:
-                if callable(route.handler):
-                    response = await route.handler(*handler_args)
-                elif asyncio.iscoroutinefunction(route.handler):
-                    response = await route.handler(*handler_args)
-                else:
-                    raise ValueError(
-                        f"Handler for route {request.method.value} {request.path} is not a function"
-                    )
-                request_response_code = HTTPResponseCode.OK
-                if issubclass(type(response), HTTPResponse):
-                    request_response_code = response.status
-                    self._send(writer, response)
-                else:
-                    self._send(writer, HTTPResponse(response))
-            except Exception as e:
-                logging.error(
-                    f"Error handling request:\n{traceback.format_exc().strip()}"
-                )
+                file_path = static.resolve_path(self.static_files_dir, request.path)
+            except PermissionError:
+                return HTTPError.FORBIDDEN
+            logger.debug("Checking for static file %s", file_path)
 
-                response = self.error_handler.handle(e)
+            if file_path is not None:
+                if self.static_cache is not None:
+                    return self.static_cache.load(request, file_path)
+                return static.file_response(request, file_path)
 
-                if isinstance(response, HTTPResponse):
-                    request_response_code = response.status
-                    self._send(writer, response)
-                else:
-                    request_response_code = HTTPResponseCode.INTERNAL_SERVER_ERROR
-                    self._send(writer, HTTPError.INTERNAL_SERVER_ERROR)
-        else:
-            request_response_code = HTTPResponseCode.NOT_FOUND
-            self._send(writer, HTTPError.NOT_FOUND)
+        if route is None:
+            return HTTPError.NOT_FOUND
+        request.route = route.path
 
-        logging.info(
-            f"{request.client_address[0]} [{datetime.datetime.now()}] {request.method.value} {request.path} {request_response_code.value}"
+        try:
+            handler_args = route.binder(request, path_vars)
+        except ValueError:
+            logger.debug("Error binding handler arguments", exc_info=True)
+            return HTTPError.BAD_REQUEST
+
+        if route.cache is not None:
+            encoding = None
+            if self.compressor is not None:
+                encoding = negotiate(request.headers.get("Accept-Encoding"))
+            return await self.route_cache.get(
+                route.cache.key(request, encoding),
+                route.cache.ttl,
+                lambda: self._call_cached(request, route, handler_args),
+            )
+        return await self._call(route, handler_args)
+
+    async def _call_cached(
+        self, request: HTTPRequest, route: RouteNode, handler_args: list
+    ) -> HTTPResponse:
+        response = await self._call(route, handler_args)
+        if self.compressor is not None:
+            # Cache the compressed bytes rather than compressing on every hit
+            response = await self.compressor.apply(request, response)
+        return response
+
+    async def _call(self, route: RouteNode, handler_args: list) -> HTTPResponse:
+        try:
+            if route.executor is None:
+                response = await route.handler(*handler_args)
+            else:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self._executor(route.executor),
+                    functools.partial(route.handler, *handler_args),
+                )
+            if issubclass(type(response), HTTPResponse):
+                if (
+                    route.executor == "thread"
+                    and isinstance(response, StreamingResponse)
+                    and response.executor is None
+                ):
+                    # Like a returned generator, produce its chunks in the pool
+                    response.executor = self._executor("thread")
+                return response
+            if isinstance(response, pyhtml.Element):
+                # Sends the top of the page while the rest is still rendering
+                return StreamingResponse(
+                    response.stream(), {"Content-Type": "text/html; charset=utf-8"}
+                )
+            if isinstance(response, Iterator) and route.executor == "thread":
+                # The handler ran in the pool but its generator would run on the loop
+                return StreamingResponse(response, executor=self._executor("thread"))
+            if isinstance(response, (AsyncIterable, Iterator)):
+                return StreamingResponse(response)
+            return HTTPResponse(response)
+        except Exception as e:
+            logger.exception("Error handling request")
+
+            response = self.error_handler.handle(e)
+
+            if isinstance(response, HTTPResponse):
+                return response
+            return HTTPError.INTERNAL_SERVER_ERROR
+
+    async def _metrics_endpoint(self):
+        return HTTPResponse(
+            self.metrics.render(),
+            {"Content-Type": METRICS_CONTENT_TYPE, "Cache-Control": "no-store"},
         )
 
-    def _register_route(self, path: str, method: HTTPMethod, handler: AsyncFunction):
-        try:
-            if self.route_tree.get_route(path, method):
-                raise ValueError(f"Route {method.value} {path} already exists")
-        except MethodNotAllowed:
-            # This is expected if the method is not allowed
-            pass
+    async def _profile_endpoint(
+        self, request: HTTPRequest, route: Optional[str] = None, download: bool = False
+    ):
+        # Not client_address, X-Real-IP: 127.0.0.1 would get anyone in
+        if request.peer_address[0] not in self.profiler.trusted:
+            return HTTPError.FORBIDDEN
+        if download:
+            data = self.profiler.pstats_bytes(route or "")
+            if data is None:
+                return HTTPError.NOT_FOUND
+            return HTTPResponse(
+                data,
+                {
+                    "Content-Type": "application/octet-stream",
+                    "Content-Disposition": 'attachment; filename="profile.pstats"',
+                },
+            )
+        return HTTPResponse(
+            self.profiler.report(route),
+            {"Content-Type": "text/plain; charset=utf-8", "Cache-Control": "no-store"},
+        )
 
-        self.route_tree.add_route(path, method, handler)
+    def _register_route(
+        self,
+        path: str,
+        method: HTTPMethod,
+        handler: AsyncFunction,
+        executor: Optional[Executor] = None,
+        cache: Optional[CachePolicy] = None,
+    ):
+        self.route_tree.add_route(path, method, handler, executor, cache)
+
+    def _executor(self, kind: Executor) -> ThreadPoolExecutor | ProcessPoolExecutor:
+        """The pool for `kind`, created on first use so forked workers get their own."""
+        if kind == "process":
+            if self.process_pool is None:
+                self.process_pool = ProcessPoolExecutor(self.process_pool_size)
+            return self.process_pool
+
+        if self.thread_pool is None:
+            self.thread_pool = ThreadPoolExecutor(
+                self.thread_pool_size, thread_name_prefix="webserver-handler"
+            )
+        return self.thread_pool
+
+    def _start_executors(self):
+        # The process pool forks its workers on first use. Doing that before any
+        # connection is accepted keeps client sockets from being inherited by
+        # the pool processes, which would stop them from ever closing.
+        if any(route.executor == "process" for route in self.route_tree.routes()):
+            self._executor("process").submit(int).result()
+
+    def _shutdown_executors(self):
+        for pool in (self.thread_pool, self.process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self.thread_pool = None
+        self.process_pool = None
+
+    def get(
+        self,
+        path: str,
+        executor: Optional[Executor] = None,
+        cache_ttl: Optional[float] = None,
+        cache_params: Optional[Iterable[str]] = None,
+        cache_headers: Iterable[str] = (),
+    ):
+        """
+        Register a GET handler. With `cache_ttl` its responses are cached for
+        that many seconds, keyed on the path, the query parameters named in
+        `cache_params` (the whole query string by default) and the request
+        headers named in `cache_headers`.
+        """
+        cache = _cache_policy(cache_ttl, cache_params, cache_headers)
 
-    def get(self, path: str):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.GET, handler)
+            self._register_route(path, HTTPMethod.GET, handler, executor, cache)
+            return handler
 
         return wrapper
 
-    def head(self, path: str):
+    def head(
+        self,
+        path: str,
+        executor: Optional[Executor] = None,
+        cache_ttl: Optional[float] = None,
+        cache_params: Optional[Iterable[str]] = None,
+        cache_headers: Iterable[str] = (),
+    ):
+        cache = _cache_policy(cache_ttl, cache_params, cache_headers)
+
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.HEAD, handler)
+            self._register_route(path, HTTPMethod.HEAD, handler, executor, cache)
+            return handler
 
         return wrapper
 
-    def post(self, path: str):
+    def post(self, path: str, executor: Optional[Executor] = None):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.POST, handler)
+            self._register_route(path, HTTPMethod.POST, handler, executor)
+            return handler
 
         return wrapper
 
-    def put(self, path: str):
+    def put(self, path: str, executor: Optional[Executor] = None):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.PUT, handler)
+            self._register_route(path, HTTPMethod.PUT, handler, executor)
+            return handler
 
         return wrapper
 
-    def delete(self, path: str):
+    def delete(self, path: str, executor: Optional[Executor] = None):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.DELETE, handler)
+            self._register_route(path, HTTPMethod.DELETE, handler, executor)
+            return handler
 
         return wrapper
 
-    def connect(self, path: str):
+    def connect(self, path: str, executor: Optional[Executor] = None):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.CONNECT, handler)
+            self._register_route(path, HTTPMethod.CONNECT, handler, executor)
+            return handler
 
         return wrapper
 
-    def options(self, path: str):
+    def options(self, path: str, executor: Optional[Executor] = None):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.OPTIONS, handler)
+            self._register_route(path, HTTPMethod.OPTIONS, handler, executor)
+            return handler
 
         return wrapper
 
-    def trace(self, path: str):
+    def trace(self, path: str, executor: Optional[Executor] = None):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.TRACE, handler)
+            self._register_route(path, HTTPMethod.TRACE, handler, executor)
+            return handler
 
         return wrapper
 
-    def patch(self, path: str):
+    def patch(self, path: str, executor: Optional[Executor] = None):
         def wrapper(handler: AsyncFunction):
-            self._register_route(path, HTTPMethod.PATCH, handler)
+            self._register_route(path, HTTPMethod.PATCH, handler, executor)
+            return handler
 
         return wrapper
+
+
+def _cache_policy(
+    ttl: Optional[float], params: Optional[Iterable[str]], headers: Iterable[str]
+) -> Optional[CachePolicy]:
+    if ttl is None:
+        return None
+    return CachePolicy(ttl, tuple(params) if params is not None else None, tuple(headers))
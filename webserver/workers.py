@@ -0,0 +1,132 @@
+import os
+import signal
+import socket
+import time
+import logging
+import asyncio
+
+from webserver import logs
+
+logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """
+    Runs a Webserver in `workers` forked processes and keeps them running.
+
+    By default the supervisor binds one listening socket that every worker
+    inherits and accepts on. With `reuse_port` each worker binds its own socket
+    with SO_REUSEPORT instead, which lets the kernel balance connections
+    between workers. Workers that die are restarted and SIGHUP is forwarded to
+    them. Workers ignore SIGINT, so Ctrl-C in a terminal only reaches them
+    through the supervisor: SIGINT and SIGTERM both send the workers a SIGTERM,
+    on which they stop accepting and finish their open requests, and workers
+    still running after `shutdown_timeout` seconds are killed.
+    """
+
+    def __init__(
+        self,
+        server,
+        workers: int,
+        reuse_port: bool = False,
+        shutdown_timeout: float = 10.0,  # seconds
+    ):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Multiple workers require os.fork, which this platform lacks")
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+
+        self.server = server
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.shutdown_timeout = shutdown_timeout
+        self.sock: socket.socket | None = None
+        self.children: dict[int, int] = {}  # pid -> worker number
+        self.stopping = False
+
+    def run(self):
+        if not self.reuse_port:
+            self.sock = socket.create_server((self.server.host, self.server.port))
+            self.sock.set_inheritable(True)
+
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            signal.signal(signum, self._forward_signal)
+
+        logger.info(
+            "Starting %d workers on %s:%s", self.workers, self.server.host, self.server.port
+        )
+        for number in range(self.workers):
+            self._spawn(number)
+
+        try:
+            self._supervise()
+        finally:
+            if self.sock is not None:
+                self.sock.close()
+
+    def _spawn(self, number: int):
+        pid = os.fork()
+        if pid != 0:
+            self.children[pid] = number
+            return
+
+        # Worker process
+        exit_code = 0
+        try:
+            # The supervisor turns SIGINT into a SIGTERM, which _run handles
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            for signum in (signal.SIGTERM, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_DFL)
+            asyncio.run(self.server._run(sock=self.sock, reuse_port=self.reuse_port))
+        except BaseException:
+            logger.exception("Worker %d crashed", number)
+            exit_code = 1
+        finally:
+            logs.stop()
+            logging.shutdown()
+            os._exit(exit_code)
+
+    def _forward_signal(self, signum, frame):
+        if signum in (signal.SIGINT, signal.SIGTERM):
+            if not self.stopping:
+                logger.info("Shutting down workers")
+            self.stopping = True
+            self.stop_deadline = time.monotonic() + self.shutdown_timeout
+            # Workers drain their connections and exit on SIGTERM
+            signum = signal.SIGTERM
+
+        for pid in self.children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self):
+        last_spawn: dict[int, float] = {}
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                if self.stopping and time.monotonic() > self.stop_deadline:
+                    logger.warning("Workers did not shut down in time, killing them")
+                    for child in self.children:
+                        os.kill(child, signal.SIGKILL)
+                    self.stop_deadline = float("inf")
+                time.sleep(0.1)
+                continue
+
+            number = self.children.pop(pid, None)
+            if number is None:
+                continue
+            exit_code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                logger.debug("Worker %d (pid %d) exited with %d", number, pid, exit_code)
+                continue
+
+            logger.error(
+                "Worker %d (pid %d) exited with %d, restarting it", number, pid, exit_code
+            )
+            # Don't spin if the worker dies right after starting
+            if time.monotonic() - last_spawn.get(number, 0) < 1.0:
+                time.sleep(1.0)
+            last_spawn[number] = time.monotonic()
+            self._spawn(number)